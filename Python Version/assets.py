@@ -1,5 +1,59 @@
 # HTML Content for the WebView
 # Optimized for Python version
+#
+# Third-party assets are vendored into web/vendor (the Outfit font ships with
+# the repo, fetch_assets.py downloads the rest) and the page is written to
+# web/chat.html, so it loads from disk without waiting for the network.
+# Missing vendored files fall back to the CDN copies below, and without
+# either, answers are shown as plain text.
+
+import os
+
+WEB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "web")
+CHAT_PAGE = os.path.join(WEB_DIR, "chat.html")
+HIGHLIGHT_WORKER = os.path.join(WEB_DIR, "highlight-worker.js")
+
+# Vendored file (relative to web/vendor) -> source URL
+VENDOR_ASSETS = {
+    "marked.min.js": "https://cdnjs.cloudflare.com/ajax/libs/marked/12.0.0/marked.min.js",
+    "highlight.min.js": "https://cdnjs.cloudflare.com/ajax/libs/highlight.js/11.9.0/highlight.min.js",
+    "atom-one-dark.min.css": "https://cdnjs.cloudflare.com/ajax/libs/highlight.js/11.9.0/styles/atom-one-dark.min.css",
+}
+
+
+# Web Worker used by the page to highlight very large code blocks off its main thread
+HIGHLIGHT_WORKER_SCRIPT = """
+try {
+    importScripts('vendor/highlight.min.js');
+} catch (e) {
+    importScripts('https://cdnjs.cloudflare.com/ajax/libs/highlight.js/11.9.0/highlight.min.js');
+}
+onmessage = (event) => {
+    const { key, code, lang } = event.data;
+    postMessage({ key, html: hljs.highlight(code, { language: lang }).value });
+};
+"""
+
+
+def _write_if_changed(path, text):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            if f.read() == text:
+                return
+    except OSError:
+        pass
+    os.makedirs(WEB_DIR, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def write_chat_page():
+    # Writes web/chat.html (and its worker script) if missing or out of date
+    # and returns the page's path
+    _write_if_changed(HIGHLIGHT_WORKER, HIGHLIGHT_WORKER_SCRIPT)
+    _write_if_changed(CHAT_PAGE, get_html_content())
+    return CHAT_PAGE
+
 
 def get_html_content():
     return r"""
@@ -10,9 +64,11 @@ def get_html_content():
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>AI Chat Interface</title>
     <!-- Highlight.js Styles -->
-    <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/highlight.js/11.9.0/styles/atom-one-dark.min.css">
+    <link rel="stylesheet" href="vendor/atom-one-dark.min.css"
+          onerror="this.onerror = null; this.href = 'https://cdnjs.cloudflare.com/ajax/libs/highlight.js/11.9.0/styles/atom-one-dark.min.css'">
     <!-- Font -->
-    <link rel="stylesheet" href="https://fonts.googleapis.com/css2?family=Outfit:wght@300;400;500;600;700&display=swap">
+    <link rel="stylesheet" href="vendor/fonts/outfit.css"
+          onerror="this.onerror = null; this.href = 'https://fonts.googleapis.com/css2?family=Outfit:wght@300;400;500;600;700&display=swap'">
     
     <style>
         /* INJECTED USER CSS START */
@@ -49,8 +105,14 @@ def get_html_content():
             display: flex;
             flex-direction: column;
             gap: 1.5rem;
-            scroll-behavior: smooth;
         }
+
+        .transcript-window {
+            display: flex;
+            flex-direction: column;
+            gap: 1.5rem;
+        }
+        .message-placeholder { flex-shrink: 0; }
         
         .chat-container::-webkit-scrollbar { width: 8px; }
         .chat-container::-webkit-scrollbar-track { background: transparent; }
@@ -63,9 +125,11 @@ def get_html_content():
             line-height: 1.6;
             position: relative;
             font-size: 1rem;
-            animation: fadeIn 0.3s ease-in-out;
         }
 
+        /* Only new messages animate, not ones scrolled back into view */
+        .fresh { animation: fadeIn 0.3s ease-in-out; }
+
         @keyframes fadeIn {
             from { opacity: 0; transform: translateY(10px); }
             to { opacity: 1; transform: translateY(0); }
@@ -86,6 +150,32 @@ def get_html_content():
             border: var(--glass-border);
         }
 
+        /* Side-by-side model comparison */
+        .compare-row {
+            display: flex;
+            gap: 1rem;
+            align-items: flex-start;
+        }
+        .compare-row .message {
+            flex: 1;
+            min-width: 0;
+            max-width: none;
+        }
+        .model-label {
+            font-size: 0.75rem;
+            font-weight: 600;
+            color: var(--text-secondary);
+            margin-bottom: 0.5rem;
+            text-transform: uppercase;
+            letter-spacing: 0.05em;
+        }
+        .message-note {
+            font-size: 0.75rem;
+            color: var(--text-secondary);
+            margin-top: 0.5rem;
+            font-style: italic;
+        }
+
         /* Markdown Styles */
         .message img { max-width: 100%; border-radius: 8px; margin-top: 10px; border: 1px solid rgba(255,255,255,0.1); }
         .message pre {
@@ -156,85 +246,574 @@ def get_html_content():
     </style>
     
     <!-- Scripts -->
-    <script src="https://cdnjs.cloudflare.com/ajax/libs/marked/12.0.0/marked.min.js"></script>
-    <script src="https://cdnjs.cloudflare.com/ajax/libs/highlight.js/11.9.0/highlight.min.js"></script>
+    <script src="vendor/marked.min.js"></script>
+    <script>window.marked || document.write('<script src="https://cdnjs.cloudflare.com/ajax/libs/marked/12.0.0/marked.min.js"><\/script>')</script>
+    <script src="vendor/highlight.min.js"></script>
+    <script>window.hljs || document.write('<script src="https://cdnjs.cloudflare.com/ajax/libs/highlight.js/11.9.0/highlight.min.js"><\/script>')</script>
+    <script src="qrc:///qtwebchannel/qwebchannel.js"></script>
 </head>
 <body>
     <div id="chat-container" class="chat-container">
         <div class="message ai">
             <p>Welcome to AI Chat! Select a model and start chatting.</p>
         </div>
+        <div id="top-spacer"></div>
+        <div id="transcript-window" class="transcript-window"></div>
+        <div id="bottom-spacer"></div>
     </div>
 
     <script>
         const chatContainer = document.getElementById('chat-container');
-        let currentAiMessageDiv = null;
-        let currentAiMessageContent = "";
+        const streams = {};  // stream id -> StreamRenderer
+        let bridge = null;   // ChatBridge from bridge.py, set once the channel is up
 
-        // Scroll to bottom helper
-        function scrollToBottom() {
-            chatContainer.scrollTo({ top: chatContainer.scrollHeight, behavior: 'smooth' });
+        // Auto-scroll runs at most once per frame, and only while the user is
+        // at the bottom; scrolling up pauses it until they come back down.
+        let pinnedToBottom = true;
+        let autoScrollRequested = false;
+        let ignoreNextScroll = false;
+
+        function requestAutoScroll() {
+            if (!pinnedToBottom || autoScrollRequested) return;
+            autoScrollRequested = true;
+            requestAnimationFrame(() => {
+                autoScrollRequested = false;
+                if (!pinnedToBottom) return;
+                updateWindow();
+                const before = chatContainer.scrollTop;
+                chatContainer.scrollTop = chatContainer.scrollHeight;
+                if (chatContainer.scrollTop !== before) ignoreNextScroll = true;
+            });
         }
 
-        // Copy functionality
+        // Copy functionality (the clipboard is set natively by Python)
         window.copyToClipboard = function(text, btn) {
-            navigator.clipboard.writeText(text).then(() => {
-                const originalText = btn.innerHTML;
-                btn.innerHTML = 'Check!';
-                setTimeout(() => btn.innerHTML = originalText, 2000);
-            });
+            if (!bridge) return;
+            bridge.copyText(text);
+            const originalText = btn.innerHTML;
+            btn.innerHTML = 'Check!';
+            setTimeout(() => btn.innerHTML = originalText, 2000);
         };
 
+        // The code element's text is the original code, highlighted or not,
+        // so nothing has to be escaped into the button
+        window.copyCode = function(btn) {
+            copyToClipboard(btn.closest('pre').querySelector('code').textContent, btn);
+        };
+
+        // --- Code highlighting ---
+        // hljs only runs on code blocks that are complete: a block still
+        // streaming in the tail is shown as plain text. Results are memoized by
+        // content, so re-parses and remounts of a block cost a lookup, and very
+        // large blocks are highlighted in a Web Worker.
+        const HIGHLIGHT_CACHE_MAX_CHARS = 2000000;
+        const WORKER_MIN_CHARS = 20000;
+        const highlightCache = new Map();  // key -> {code, html}, least recently used first
+        let highlightCacheChars = 0;
+        let highlightWorker;               // created on first use, null if unavailable
+        const workerJobs = new Map();      // key -> {code, lang} waiting for the worker
+        let plainCodeBlocks = false;       // set while parsing a streaming tail
+
+        function escapeHtml(text) {
+            return text.replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;');
+        }
+
+        function highlightKey(code, lang) {
+            let hash = 0x811c9dc5;  // FNV-1a
+            for (let i = 0; i < code.length; i++) {
+                hash ^= code.charCodeAt(i);
+                hash = Math.imul(hash, 0x01000193);
+            }
+            return `${lang}-${code.length}-${(hash >>> 0).toString(36)}`;
+        }
+
+        function cachedHighlight(key, code) {
+            const entry = highlightCache.get(key);
+            if (!entry || entry.code !== code) return null;
+            highlightCache.delete(key);
+            highlightCache.set(key, entry);
+            return entry.html;
+        }
+
+        function storeHighlight(key, code, html) {
+            const old = highlightCache.get(key);
+            if (old) highlightCacheChars -= old.code.length + old.html.length;
+            highlightCache.delete(key);
+            highlightCache.set(key, { code, html });
+            highlightCacheChars += code.length + html.length;
+            for (const [oldKey, entry] of highlightCache) {
+                if (highlightCacheChars <= HIGHLIGHT_CACHE_MAX_CHARS) break;
+                highlightCache.delete(oldKey);
+                highlightCacheChars -= entry.code.length + entry.html.length;
+            }
+        }
+
+        function applyHighlight(key, html) {
+            const job = workerJobs.get(key);
+            workerJobs.delete(key);
+            if (job) storeHighlight(key, job.code, html);
+            for (const el of document.querySelectorAll(`code[data-highlight="${key}"]`)) {
+                el.innerHTML = html;
+                el.removeAttribute('data-highlight');
+            }
+        }
+
+        function getHighlightWorker() {
+            if (highlightWorker !== undefined) return highlightWorker;
+            try {
+                highlightWorker = new Worker('highlight-worker.js');
+                highlightWorker.onmessage = (event) => applyHighlight(event.data.key, event.data.html);
+                highlightWorker.onerror = () => {
+                    // No worker after all: finish its jobs here
+                    highlightWorker = null;
+                    for (const [key, job] of [...workerJobs]) {
+                        applyHighlight(key, hljs.highlight(job.code, { language: job.lang }).value);
+                    }
+                };
+            } catch (e) {
+                highlightWorker = null;
+            }
+            return highlightWorker;
+        }
+
+        // Returns the inner HTML for a code element and, when the highlighted
+        // version arrives later, the key it will be applied under
+        function highlightCode(code, lang) {
+            if (plainCodeBlocks || !window.hljs) return { html: escapeHtml(code) };
+            const key = highlightKey(code, lang);
+            const cached = cachedHighlight(key, code);
+            if (cached !== null) return { html: cached };
+            if (code.length >= WORKER_MIN_CHARS && getHighlightWorker()) {
+                if (!workerJobs.has(key)) {
+                    workerJobs.set(key, { code, lang });
+                    highlightWorker.postMessage({ key, code, lang });
+                }
+                return { html: escapeHtml(code), pendingKey: key };
+            }
+            const html = hljs.highlight(code, { language: lang }).value;
+            storeHighlight(key, code, html);
+            return { html };
+        }
+
+        // Neither library is vendored and the CDN is unreachable: show the
+        // text as it is rather than stopping the script before the bridge is up
+        function renderMarkdown(text) {
+            if (!window.marked) return `<p style="white-space: pre-wrap">${escapeHtml(text)}</p>`;
+            return marked.parse(text);
+        }
+
         // Custom renderer for code blocks to add copy button
-        const renderer = new marked.Renderer();
+        const renderer = window.marked ? new marked.Renderer() : {};
         renderer.code = function(code, language) {
-            const validLang = hljs.getLanguage(language) ? language : 'plaintext';
-            const highlighted = hljs.highlight(code, { language: validLang }).value;
-            // Escape code for onclick attribute
-            const escapedCode = code.replace(/\\/g, '\\\\').replace(/`/g, '\\`').replace(/"/g, '&quot;').replace(/'/g, '&#39;');
-            
+            const validLang = window.hljs && hljs.getLanguage(language) ? language : 'plaintext';
+            const { html, pendingKey } = highlightCode(code, validLang);
+            const pending = pendingKey ? ` data-highlight="${pendingKey}"` : '';
+
             return `
             <pre><div class="code-header">
                 <span>${validLang}</span>
-                <button class="copy-btn" onclick="copyToClipboard(\`${escapedCode}\`, this)">Copy</button>
-            </div><div class="code-content"><code class="hljs language-${validLang}">${highlighted}</code></div></pre>
+                <button class="copy-btn" onclick="copyCode(this)">Copy</button>
+            </div><div class="code-content"><code class="hljs language-${validLang}"${pending}>${html}</code></div></pre>
             `;
         };
-        marked.use({ renderer });
+        // Answers are untrusted: raw HTML in them is shown as text, and links
+        // and images only keep web URLs
+        const SAFE_LINK = /^(https?:|mailto:|#)/i;
+        const SAFE_IMAGE = /^https:/i;
+        renderer.html = function(html) {
+            return escapeHtml(html);
+        };
+        renderer.link = function(href, title, text) {
+            if (!SAFE_LINK.test(href || '')) return text;
+            return marked.Renderer.prototype.link.call(this, href, title, text);
+        };
+        renderer.image = function(href, title, text) {
+            if (!SAFE_IMAGE.test(href || '')) return escapeHtml(text || '');
+            return marked.Renderer.prototype.image.call(this, href, title, text);
+        };
+        if (window.marked) marked.use({ renderer });
 
-        // API Functions called from Python
-        
-        window.appendUserMessage = function(text) {
-            const div = document.createElement('div');
-            div.className = 'message user';
-            // Parse simplistic markdown for user too if needed, or just text
-            div.innerHTML = marked.parse(text); 
-            chatContainer.appendChild(div);
-            scrollToBottom();
+        // Streaming renderer: markdown blocks that can no longer change are
+        // parsed once and frozen in the DOM, only the trailing block is
+        // re-parsed on each flush. Flushes are coalesced to one per frame.
+        class StreamRenderer {
+            constructor(div) {
+                this.div = div;
+                this.frozenEl = document.createElement('div');
+                this.tailEl = document.createElement('div');
+                this.content = "";   // full message text
+                this.pending = "";   // text after the last frozen block
+                this.incoming = "";  // tokens received since the last frame
+                this.scanPos = 0;    // start of the first unscanned line in pending
+                this.prevBlank = false;
+                this.fence = null;   // open fence marker, e.g. "```"
+                this.inList = false; // a list may still continue, so nothing inside it is frozen
+                this.started = false;
+                this.frameRequested = false;
+            }
+
+            append(text) {
+                this.incoming += text;
+                if (!this.frameRequested) {
+                    this.frameRequested = true;
+                    requestAnimationFrame(() => this.render());
+                }
+            }
+
+            // Walk the complete lines added since the last render and return
+            // the offset up to which pending holds only finished blocks.
+            findFreezePoint() {
+                let freezeAt = 0;
+                let nl;
+                while ((nl = this.pending.indexOf('\n', this.scanPos)) !== -1) {
+                    const lineStart = this.scanPos;
+                    const line = this.pending.slice(lineStart, nl);
+                    this.scanPos = nl + 1;
+
+                    if (this.fence) {
+                        const close = line.match(/^ {0,3}(`{3,}|~{3,})\s*$/);
+                        if (close && close[1][0] === this.fence[0] && close[1].length >= this.fence.length) {
+                            this.fence = null;
+                            if (!this.inList) freezeAt = this.scanPos;
+                        }
+                        continue;
+                    }
+                    if (!line.trim()) {
+                        this.prevBlank = true;
+                        continue;
+                    }
+                    // A non-indented line after a blank line starts a new block,
+                    // unless it is the next item of an open list; indented ones
+                    // may still continue a list item or code block.
+                    const listItem = /^ {0,3}([-+*]|\d{1,9}[.)])(\s|$)/.test(line);
+                    if (this.prevBlank && !/^\s/.test(line) && !(listItem && this.inList)) {
+                        freezeAt = lineStart;
+                        this.inList = false;
+                    }
+                    if (listItem) this.inList = true;
+                    this.prevBlank = false;
+
+                    const open = line.match(/^ {0,3}(`{3,}|~{3,})/);
+                    if (open) {
+                        if (!this.inList) freezeAt = lineStart;
+                        this.fence = open[1];
+                    }
+                }
+                return freezeAt;
+            }
+
+            render() {
+                this.frameRequested = false;
+                if (!this.started) {
+                    this.div.innerHTML = '';
+                    this.div.appendChild(this.frozenEl);
+                    this.div.appendChild(this.tailEl);
+                    this.started = true;
+                }
+                this.content += this.incoming;
+                this.pending += this.incoming;
+                this.incoming = "";
+
+                const freezeAt = this.findFreezePoint();
+                if (freezeAt > 0) {
+                    this.frozenEl.insertAdjacentHTML('beforeend', renderMarkdown(this.pending.slice(0, freezeAt)));
+                    this.pending = this.pending.slice(freezeAt);
+                    this.scanPos -= freezeAt;
+                }
+                // Code in the tail is still being written: no highlighting yet
+                plainCodeBlocks = true;
+                try {
+                    this.tailEl.innerHTML = this.pending ? renderMarkdown(this.pending) : '';
+                } finally {
+                    plainCodeBlocks = false;
+                }
+                requestAutoScroll();
+            }
+
+            finish() {
+                if (this.incoming || !this.started) this.render();
+                if (this.pending) {
+                    this.frozenEl.insertAdjacentHTML('beforeend', renderMarkdown(this.pending));
+                    this.pending = "";
+                }
+                this.tailEl.remove();
+            }
+        }
+
+        // --- Virtualized transcript ---
+        // Python owns the full list of transcript items (TranscriptModel in
+        // transcript.py). Only the items around the viewport are in the DOM;
+        // spacers stand in for the rest, sized from measured heights.
+        const ESTIMATED_HEIGHT = 120;
+        const OVERSCAN = 5;  // items kept above and below the viewport
+        const windowEl = document.getElementById('transcript-window');
+        const topSpacer = document.getElementById('top-spacer');
+        const bottomSpacer = document.getElementById('bottom-spacer');
+        const transcript = {
+            count: 0,
+            heights: [],             // height including the gap, per item
+            data: new Map(),         // index -> item from Python, for the current window
+            mounted: new Map(),      // index -> element (or placeholder) in the DOM
+            live: new Map(),         // index -> element of an item that is still streaming
+            liveStreams: new Map(),  // index -> number of its streams still running
+            requested: null,         // "start:end" of the outstanding item request
         };
+        let itemGap = parseFloat(getComputedStyle(windowEl).rowGap) || 0;
+
+        const resizeObserver = new ResizeObserver((entries) => {
+            for (const entry of entries) {
+                transcript.heights[entry.target.transcriptIndex] = entry.target.offsetHeight + itemGap;
+            }
+        });
+
+        function appendNote(div, note) {
+            const noteDiv = document.createElement('div');
+            noteDiv.className = 'message-note';
+            noteDiv.textContent = note;
+            div.appendChild(noteDiv);
+        }
 
-        window.startAIMessage = function() {
+        function createAIColumn(column, index) {
             const div = document.createElement('div');
             div.className = 'message ai';
-            // Initial placeholder
-            div.innerHTML = '<div class="typing-indicator"><span></span><span></span><span></span></div>';
-            chatContainer.appendChild(div);
-            currentAiMessageDiv = div;
-            currentAiMessageContent = "";
-            scrollToBottom();
-        };
+            if (column.label) {
+                const labelDiv = document.createElement('div');
+                labelDiv.className = 'model-label';
+                labelDiv.textContent = column.label;
+                div.appendChild(labelDiv);
+            }
+            const body = document.createElement('div');
+            div.appendChild(body);
+            if (column.streamId) {
+                // Initial placeholder
+                body.innerHTML = '<div class="typing-indicator"><span></span><span></span><span></span></div>';
+                const stream = new StreamRenderer(body);
+                stream.index = index;
+                stream.column = div;
+                streams[column.streamId] = stream;
+            } else {
+                body.innerHTML = renderMarkdown(column.content || '');
+                if (column.note) appendNote(div, column.note);
+            }
+            return div;
+        }
 
-        window.appendAIToken = function(token) {
-            if (!currentAiMessageDiv) return;
-            currentAiMessageContent += token;
-            // Re-render the markdown with new content
-            currentAiMessageDiv.innerHTML = marked.parse(currentAiMessageContent);
-            scrollToBottom();
-        };
-        
-        window.updateFontSize = function(size) {
-            document.documentElement.style.fontSize = size + 'px';
-        };
+        // One column per model when comparing, all streaming at the same time
+        function createItemElement(index, item) {
+            let el;
+            if (item.role === 'user') {
+                el = document.createElement('div');
+                el.className = 'message user';
+                el.innerHTML = renderMarkdown(item.content);
+            } else if (item.role === 'compare') {
+                el = document.createElement('div');
+                el.className = 'compare-row';
+                for (const column of item.columns) el.appendChild(createAIColumn(column, index));
+            } else {
+                el = createAIColumn(item, index);
+            }
+            if (item.fresh) el.classList.add('fresh');
+            el.transcriptIndex = index;
+            return el;
+        }
+
+        function createPlaceholder(index) {
+            const el = document.createElement('div');
+            el.className = 'message-placeholder';
+            el.style.height = Math.max(0, transcript.heights[index] - itemGap) + 'px';
+            el.isPlaceholder = true;
+            return el;
+        }
+
+        function elementFor(index) {
+            let el = transcript.mounted.get(index);
+            if (el && !el.isPlaceholder) return el;
+            el = transcript.live.get(index);
+            if (!el) {
+                const item = transcript.data.get(index);
+                if (!item) return null;
+                el = createItemElement(index, item);
+            }
+            resizeObserver.observe(el);
+            return el;
+        }
+
+        function sumHeights(start, end) {
+            let total = 0;
+            for (let i = start; i < end; i++) total += transcript.heights[i];
+            return total;
+        }
+
+        function updateWindow() {
+            const count = transcript.count;
+            const heights = transcript.heights;
+            const viewHeight = chatContainer.clientHeight;
+            let i, y = 0;
+            if (pinnedToBottom) {
+                i = count;
+                while (i > 0 && y < viewHeight) y += heights[--i];
+                renderWindow(Math.max(0, i - OVERSCAN), count - 1);
+                return;
+            }
+            const viewTop = chatContainer.scrollTop - topSpacer.offsetTop;
+            i = 0;
+            while (i < count && y + heights[i] <= viewTop) y += heights[i++];
+            const first = Math.max(0, i - OVERSCAN);
+            while (i < count && y < viewTop + viewHeight) y += heights[i++];
+            renderWindow(first, Math.min(count - 1, i - 1 + OVERSCAN));
+        }
+
+        function renderWindow(first, last) {
+            const t = transcript;
+            const elements = [];
+            const mounted = new Map();
+            let missingStart = -1, missingEnd = -1;
+            for (let index = first; index <= last; index++) {
+                let el = elementFor(index);
+                if (!el) {
+                    if (missingStart < 0) missingStart = index;
+                    missingEnd = index + 1;
+                    el = t.mounted.get(index) || createPlaceholder(index);
+                }
+                mounted.set(index, el);
+                elements.push(el);
+            }
+            for (const [index, el] of t.mounted) {
+                if (!mounted.has(index) && !el.isPlaceholder) resizeObserver.unobserve(el);
+            }
+            for (const index of t.data.keys()) {
+                if (index < first || index > last) t.data.delete(index);
+            }
+
+            // Only touch the DOM when the window actually changed
+            const children = windowEl.children;
+            let changed = elements.length !== children.length;
+            for (let k = 0; !changed && k < elements.length; k++) changed = children[k] !== elements[k];
+            if (changed) windowEl.replaceChildren(...elements);
+            t.mounted = mounted;
+
+            topSpacer.style.height = sumHeights(0, first) + 'px';
+            bottomSpacer.style.height = sumHeights(last + 1, t.count) + 'px';
+            if (missingStart >= 0) requestItems(missingStart, missingEnd);
+        }
+
+        function requestItems(start, end) {
+            const key = start + ':' + end;
+            if (!bridge || transcript.requested === key) return;
+            transcript.requested = key;
+            bridge.requestItems(start, end);
+        }
+
+        function resetTranscript(count) {
+            for (const id in streams) delete streams[id];
+            resizeObserver.disconnect();
+            windowEl.replaceChildren();
+            transcript.count = count;
+            transcript.heights = new Array(count).fill(ESTIMATED_HEIGHT);
+            transcript.data.clear();
+            transcript.mounted.clear();
+            transcript.live.clear();
+            transcript.liveStreams.clear();
+            transcript.requested = null;
+            pinnedToBottom = true;
+            updateWindow();
+            requestAutoScroll();
+        }
+
+        function loadItems(start, items) {
+            transcript.requested = null;
+            items.forEach((item, k) => {
+                if (item) transcript.data.set(start + k, item);
+            });
+            updateWindow();
+            requestAutoScroll();
+        }
+
+        function appendItems(start, items, follow) {
+            const t = transcript;
+            items.forEach((item, k) => {
+                const index = start + k;
+                item.fresh = true;
+                t.heights[index] = ESTIMATED_HEIGHT;
+                const columns = item.role === 'compare' ? item.columns : [item];
+                const liveCount = columns.filter((column) => column.streamId).length;
+                if (liveCount) {
+                    // Streaming items keep their element even while scrolled out of view
+                    t.live.set(index, createItemElement(index, item));
+                    t.liveStreams.set(index, liveCount);
+                } else {
+                    t.data.set(index, item);
+                }
+            });
+            t.count = Math.max(t.count, start + items.length);
+            if (follow) pinnedToBottom = true;
+            updateWindow();
+            requestAutoScroll();
+        }
+
+        // Receives the tokens of one frame, already coalesced on the Python side
+        function appendAITokens(id, tokens) {
+            if (streams[id]) streams[id].append(tokens.join(''));
+        }
+
+        function finishAIMessage(id, note) {
+            const stream = streams[id];
+            if (!stream) return;
+            stream.finish();
+            if (note) appendNote(stream.column, note);
+            delete streams[id];
+
+            // Once all its streams are done the item is rendered from Python's copy
+            const remaining = transcript.liveStreams.get(stream.index) - 1;
+            if (remaining > 0) {
+                transcript.liveStreams.set(stream.index, remaining);
+            } else {
+                transcript.liveStreams.delete(stream.index);
+                transcript.live.delete(stream.index);
+            }
+        }
+
+        function applySettings(settings) {
+            if (settings.fontSize) {
+                document.documentElement.style.fontSize = settings.fontSize + 'px';
+                itemGap = parseFloat(getComputedStyle(windowEl).rowGap) || 0;
+            }
+        }
+
+        // Scrolling moves the window (once per frame) and tells Python when the
+        // user leaves or returns to the bottom
+        let windowUpdateRequested = false;
+        chatContainer.addEventListener('scroll', () => {
+            if (ignoreNextScroll) {
+                ignoreNextScroll = false;
+            } else {
+                const atBottom = chatContainer.scrollHeight - chatContainer.scrollTop - chatContainer.clientHeight < 40;
+                if (atBottom !== pinnedToBottom) {
+                    pinnedToBottom = atBottom;
+                    if (bridge) bridge.reportScroll(atBottom);
+                }
+            }
+            if (!windowUpdateRequested) {
+                windowUpdateRequested = true;
+                requestAnimationFrame(() => {
+                    windowUpdateRequested = false;
+                    updateWindow();
+                });
+            }
+        }, { passive: true });
+
+        new QWebChannel(qt.webChannelTransport, (channel) => {
+            bridge = channel.objects.bridge;
+            bridge.transcriptReset.connect(resetTranscript);
+            bridge.itemsAppended.connect(appendItems);
+            bridge.itemsLoaded.connect(loadItems);
+            bridge.tokensReceived.connect(appendAITokens);
+            bridge.messageFinished.connect(finishAIMessage);
+            bridge.settingsChanged.connect(applySettings);
+            bridge.ready();
+            // Two frames later the page has painted with the bridge connected
+            requestAnimationFrame(() => requestAnimationFrame(() => bridge.reportFirstPaint()));
+        });
     </script>
 </body>
 </html>
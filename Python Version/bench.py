@@ -0,0 +1,267 @@
+# Offline benchmarks for the streaming path
+# Every scenario talks to mock_openrouter.py running in-process, so no network
+# or API key is needed:
+#   sse     SSEDecoder and parse_chunk on a synthetic stream
+#   engine  StreamEngine over HTTP: raw throughput, then many paced streams at once
+#   render  the full window on Qt's offscreen platform: tokens through the bridge
+#           into the chat page until the answer is rendered
+# Results can be saved and compared against a baseline to catch regressions.
+# Usage: python "Python Version/bench.py" [sse engine render] [--save out.json] [--baseline base.json]
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import httpx
+
+from engine import StreamEngine
+from mock_openrouter import MockConfig, MockServer, synthetic_token
+from sse import SSEDecoder, iter_deltas
+
+REGRESSION_TOLERANCE = 0.15  # relative change that counts as a regression
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+class MockThread:
+    # Runs a MockServer on its own event loop so the caller's loop stays free
+    def __init__(self, config):
+        self.server = MockServer(config)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self.server.start(), self.loop).result()
+        return self.server
+
+    def __exit__(self, *exc):
+        asyncio.run_coroutine_threadsafe(self.server.close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+class BenchListener:
+    def __init__(self):
+        self.first_token = {}
+        self.tokens = {}
+        self.errors = []
+        self.finished = threading.Semaphore(0)
+
+    def on_token(self, handle, token):
+        self.first_token.setdefault(handle.id, time.perf_counter())
+        self.tokens[handle.id] = self.tokens.get(handle.id, 0) + 1
+
+    def on_error(self, handle, message):
+        self.errors.append(message)
+
+    def on_finished(self, handle):
+        self.finished.release()
+
+
+# --- Scenarios ---
+
+def bench_sse(events=200_000, chunk_size=4096):
+    body = b"".join(
+        b"data: " + json.dumps({"choices": [{"index": 0, "delta": {"content": synthetic_token(i, 4)}}]}).encode() + b"\n\n"
+        for i in range(events)) + b"data: [DONE]\n\n"
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    decoder = SSEDecoder()
+    count = 0
+    for chunk in chunks:
+        for delta in iter_deltas(decoder, chunk):
+            if delta is not None:
+                count += 1
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert count == events, count
+    return {
+        "events_per_sec": events / elapsed,
+        "mb_per_sec": len(body) / elapsed / 1e6,
+        "peak_alloc_mb": peak / 1e6,
+    }
+
+
+def run_streams(base_url, streams, timeout=120.0):
+    engine = StreamEngine(httpx.AsyncClient(base_url=base_url, timeout=30.0,
+                                            limits=httpx.Limits(max_connections=max(streams, 10))))
+    engine.start()
+    listener = BenchListener()
+    messages = [{"role": "user", "content": "benchmark"}]
+    start = time.perf_counter()
+    handles = [engine.stream_chat("bench", "mock/fast:free", messages, listener) for _ in range(streams)]
+    for _ in handles:
+        if not listener.finished.acquire(timeout=timeout):
+            raise RuntimeError("streams did not finish in time")
+    elapsed = time.perf_counter() - start
+    engine.close()
+    if listener.errors:
+        raise RuntimeError(listener.errors[0])
+    ttfts = sorted((listener.first_token[h.id] - start) * 1000 for h in handles)
+    return elapsed, ttfts, sum(listener.tokens.values())
+
+
+def bench_engine():
+    results = {}
+    tracemalloc.start()
+    with MockThread(MockConfig(tokens=20_000, rate=0)) as server:
+        elapsed, _, tokens = run_streams(server.base_url, 1)
+        results["throughput_tokens_per_sec"] = tokens / elapsed
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    results["throughput_peak_alloc_mb"] = peak / 1e6
+
+    # Paced like a real model: what matters is how late tokens arrive, not raw speed
+    config = MockConfig(tokens=400, rate=200, first_token_delay=0.05)
+    with MockThread(config) as server:
+        elapsed, ttfts, tokens = run_streams(server.base_url, 16)
+    ideal = config.first_token_delay + config.tokens / config.rate
+    results["concurrent_ttft_p50_ms"] = statistics.median(ttfts)
+    results["concurrent_ttft_max_ms"] = ttfts[-1]
+    results["concurrent_overhead_ms"] = (elapsed - ideal) * 1000
+    return results
+
+
+def bench_render(turns=3):
+    # The window reads its configuration from the environment at import time
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    workdir = tempfile.mkdtemp(prefix="aichat-bench-")
+    os.environ["AICHAT_DATA_DIR"] = os.path.join(workdir, "data")
+    with open(os.path.join(workdir, "APIKEY.txt"), "w") as f:
+        f.write("bench")
+    os.chdir(workdir)
+
+    config = MockConfig(tokens=2000, rate=1000, chunk_tokens=2)
+    with MockThread(config) as server:
+        os.environ["AICHAT_API_BASE_URL"] = server.base_url
+        from PySide6.QtCore import QEventLoop, QTimer, Qt
+        from PySide6.QtWidgets import QApplication
+        import main
+
+        main.CATALOG_REFRESH_DELAY_MS = 24 * 3600 * 1000  # keep probes out of the numbers
+        QApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
+        app = QApplication.instance() or QApplication(sys.argv)
+        window = main.AIChatApp()
+        window.show()
+
+        def wait(signal, timeout=60.0):
+            loop = QEventLoop()
+            received = []
+            def done(*args):
+                received.append(args)
+                loop.quit()
+            signal.connect(done)
+            QTimer.singleShot(int(timeout * 1000), loop.quit)
+            loop.exec()
+            signal.disconnect(done)
+            if not received:
+                raise RuntimeError(f"timed out waiting for {signal}")
+            return received[0]
+
+        frames = []
+        window.bridge.tokensReceived.connect(lambda stream_id, tokens: frames.append(len(tokens)))
+        wait(window.bridge.pageReady)
+
+        turn_times, ttfts, frame_counts = [], [], []
+        for turn in range(turns):
+            frames.clear()
+            first = []
+            on_first = lambda *args: first.append(time.perf_counter()) if not first else None
+            window.engine_signals.token_received.connect(on_first)
+            window.input_text.setPlainText(f"benchmark turn {turn}")
+            start = time.perf_counter()
+            window.send_message()
+            wait(window.bridge.messageFinished)
+            # Round trip through the page: returns once the answer has been laid out
+            wait_js = QEventLoop()
+            rendered = []
+            window.web_page.runJavaScript(
+                "document.getElementById('transcript-window').innerText.length",
+                0, lambda length: (rendered.append(length), wait_js.quit()))
+            wait_js.exec()
+            if not rendered or rendered[0] < config.tokens * config.token_chars:
+                raise RuntimeError("the answer was not rendered")
+            turn_times.append((time.perf_counter() - start) * 1000)
+            ttfts.append((first[0] - start) * 1000)
+            frame_counts.append(len(frames))
+            window.engine_signals.token_received.disconnect(on_first)
+
+        ideal = config.tokens / config.rate * 1000
+        window.close()
+        app.processEvents()
+    return {
+        "turn_overhead_ms": statistics.median(turn_times) - ideal,
+        "gui_ttft_ms": statistics.median(ttfts),
+        "bridge_frames_per_turn": statistics.median(frame_counts),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+SCENARIOS = {"sse": bench_sse, "engine": bench_engine, "render": bench_render}
+
+# --- Reporting ---
+
+def regressions(results, baseline):
+    # Rates should not drop, times and memory should not grow
+    found = []
+    for scenario, metrics in results.items():
+        for name, value in metrics.items():
+            old = baseline.get(scenario, {}).get(name)
+            if value is None or not old or "frames" in name:
+                continue
+            change = (value - old) / abs(old)
+            if "_per_sec" not in name:
+                change = -change
+            if change < -REGRESSION_TOLERANCE:
+                found.append(f"{scenario}.{name}: {old:.2f} -> {value:.2f}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the streaming path")
+    parser.add_argument("scenarios", nargs="*", help=f"any of {', '.join(SCENARIOS)} (default: sse engine)")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON file from an earlier --save to compare against")
+    args = parser.parse_args()
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario: {', '.join(unknown)}")
+
+    results = {}
+    for name in args.scenarios or ["sse", "engine"]:
+        results[name] = SCENARIOS[name]()
+        for metric, value in results[name].items():
+            print(f"{name:7} {metric:28} {'-' if value is None else f'{value:12.2f}'}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            found = regressions(results, json.load(f))
+        for line in found:
+            print(f"REGRESSION {line}")
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
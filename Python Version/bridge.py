@@ -0,0 +1,43 @@
+# QWebChannel bridge between AIChatApp and the chat page
+# The page connects to these signals once at load time, so every update after
+# that is a plain message over the channel instead of a script to evaluate.
+# Slots are the way back: the page calls them for events Python cares about.
+
+from PySide6.QtCore import QObject, Signal, Slot
+
+
+class ChatBridge(QObject):
+    # --- Python -> page ---
+    transcriptReset = Signal(int)                  # number of items (see transcript.py)
+    itemsAppended = Signal(int, "QVariantList", bool)  # index of the first item, items, scroll to them
+    itemsLoaded = Signal(int, "QVariantList")      # reply to requestItems
+    tokensReceived = Signal(str, "QVariantList")   # stream id, tokens since the last frame
+    messageFinished = Signal(str, str)             # stream id, note ("" for none)
+    settingsChanged = Signal("QVariantMap")        # e.g. {"fontSize": 14}
+
+    # --- Page -> Python ---
+    pageReady = Signal()
+    firstPaint = Signal()
+    copyRequested = Signal(str)
+    scrollChanged = Signal(bool)                   # True when scrolled to the bottom
+    itemsRequested = Signal(int, int)              # start, end (exclusive)
+
+    @Slot()
+    def ready(self):
+        self.pageReady.emit()
+
+    @Slot(str)
+    def copyText(self, text):
+        self.copyRequested.emit(text)
+
+    @Slot(bool)
+    def reportScroll(self, at_bottom):
+        self.scrollChanged.emit(at_bottom)
+
+    @Slot(int, int)
+    def requestItems(self, start, end):
+        self.itemsRequested.emit(start, end)
+
+    @Slot()
+    def reportFirstPaint(self):
+        self.firstPaint.emit()
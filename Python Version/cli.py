@@ -0,0 +1,149 @@
+# Headless batch runner: sends every prompt of a JSONL file through the same
+# StreamEngine as the app, without Qt, so it runs on machines with no display.
+# Input lines are {"id": ..., "prompt": "..."} or {"id": ..., "messages": [...]},
+# optionally with their own "model". Results are appended to the output file
+# as each prompt finishes; rerunning with the same output skips prompts that
+# already have an answer, so an interrupted run picks up where it stopped.
+# Usage: python "Python Version/cli.py" prompts.jsonl -o results.jsonl [--model M] [--workers 4]
+
+import argparse
+import json
+import queue
+import sys
+import time
+
+from config import API_BASE_URL, load_api_key
+from engine import StreamEngine, create_client
+from ratelimit import RateLimiter
+
+DEFAULT_MODEL = "openrouter/free"
+
+
+class BatchListener:
+    # Callbacks arrive on the engine thread; finished handles are handed to the main thread
+    def __init__(self):
+        self.tokens = {}
+        self.errors = {}
+        self.finished = queue.Queue()
+
+    def on_token(self, handle, token):
+        self.tokens.setdefault(handle.id, []).append(token)
+
+    def on_error(self, handle, message):
+        self.errors[handle.id] = message
+
+    def on_finished(self, handle):
+        self.finished.put(handle)
+
+
+def read_prompts(path, default_model):
+    prompts = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            messages = entry.get("messages") or [{"role": "user", "content": entry["prompt"]}]
+            prompts.append({"id": str(entry.get("id", line_number)), "model": entry.get("model", default_model),
+                            "messages": messages})
+    return prompts
+
+
+def completed_ids(path):
+    # Prompts answered by an earlier run; failed ones are tried again
+    done = set()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except ValueError:
+                    continue  # a line cut short by the interruption
+                if not result.get("error"):
+                    done.add(str(result["id"]))
+    except OSError:
+        pass
+    return done
+
+
+def run(args):
+    api_key = load_api_key(args.api_key_file)
+    if not api_key:
+        print("No API key: set OPENROUTER_API_KEY or create APIKEY.txt", file=sys.stderr)
+        return 2
+
+    prompts = read_prompts(args.input, args.model)
+    done = completed_ids(args.output)
+    pending = [p for p in prompts if p["id"] not in done]
+    print(f"{len(prompts)} prompts, {len(prompts) - len(pending)} already done, running {len(pending)}",
+          file=sys.stderr)
+
+    engine = StreamEngine(create_client(args.base_url, max_connections=args.workers,
+                                        max_keepalive=args.workers, read_timeout=args.timeout))
+    engine.max_retries = args.retries
+    engine.stall_timeout = args.timeout
+    engine.rate_limiter = RateLimiter(args.rpm)
+    engine.start()
+    listener = BatchListener()
+    running = {}  # stream id -> (prompt, start time)
+    failures = 0
+
+    try:
+        with open(args.output, "a", encoding="utf-8") as out:
+            while pending or running:
+                while pending and len(running) < args.workers:
+                    prompt = pending.pop(0)
+                    handle = engine.stream_chat(api_key, prompt["model"], prompt["messages"], listener)
+                    running[handle.id] = (prompt, time.perf_counter())
+
+                # A blocking get() without a timeout cannot be interrupted
+                # by Ctrl+C on Windows, so wait in short slices
+                try:
+                    handle = listener.finished.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                prompt, started = running.pop(handle.id)
+                error = listener.errors.pop(handle.id, None)
+                result = {
+                    "id": prompt["id"],
+                    "model": handle.model,
+                    "content": "".join(listener.tokens.pop(handle.id, [])),
+                    "finish_reason": handle.finish_reason,
+                    "usage": handle.usage,
+                    "ttft": round(handle.ttft, 3) if handle.ttft is not None else None,
+                    "elapsed": round(time.perf_counter() - started, 3),
+                    "attempts": handle.attempts,
+                    "error": error,
+                }
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+                if error:
+                    failures += 1
+                if not args.quiet:
+                    status = f"error: {error}" if error else f"{result['elapsed']:.1f}s"
+                    print(f"[{prompt['id']}] {handle.model} {status}", file=sys.stderr)
+    except KeyboardInterrupt:
+        print(f"Interrupted with {len(running)} prompts in flight; rerun to resume", file=sys.stderr)
+        return 130
+    finally:
+        engine.close()
+    return 1 if failures else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a JSONL file of prompts against OpenRouter")
+    parser.add_argument("input", help="JSONL file of prompts")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file results are appended to")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="model for prompts that do not name one")
+    parser.add_argument("--workers", type=int, default=4, help="prompts in flight at once")
+    parser.add_argument("--retries", type=int, default=2, help="retries per prompt on 429/5xx/stalls")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds without data before giving up")
+    parser.add_argument("--rpm", type=float, default=20, help="requests per minute per model until the API says otherwise")
+    parser.add_argument("--base-url", default=API_BASE_URL)
+    parser.add_argument("--api-key-file", help="default: $OPENROUTER_API_KEY, then APIKEY.txt")
+    parser.add_argument("-q", "--quiet", action="store_true")
+    return run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
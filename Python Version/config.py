@@ -0,0 +1,17 @@
+# Settings shared by the command-line tools (cli.py, gateway.py)
+
+import os
+
+API_BASE_URL = os.environ.get("AICHAT_API_BASE_URL") or "https://openrouter.ai/api/v1"
+
+
+def load_api_key(path=None):
+    if os.environ.get("OPENROUTER_API_KEY"):
+        return os.environ["OPENROUTER_API_KEY"].strip()
+    for candidate in ([path] if path else ["APIKEY.txt", "../APIKEY.txt"]):
+        try:
+            with open(candidate, "r") as f:
+                return f.read().strip()
+        except OSError:
+            pass
+    return ""
@@ -0,0 +1,118 @@
+# Token-budgeted context packing
+# Builds the message list for a request from a per-model token budget instead
+# of a fixed message count. Token counts are estimated once per message and
+# cached on the message dict under "tokens". With a retrieval index attached,
+# earlier chunks relevant to the latest message are recalled into the request
+# when older turns had to be left out.
+
+MESSAGE_OVERHEAD_TOKENS = 4  # role and separators added by the chat template
+RECALL_HEADER = "Earlier messages that may be relevant:\n\n"
+
+
+def estimate_tokens(text):
+    # Roughly 4 characters per token for ASCII text; other characters
+    # (CJK, emoji, ...) are closer to one token each.
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+
+
+def message_tokens(message):
+    tokens = message.get("tokens")
+    if tokens is None:
+        tokens = estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+        message["tokens"] = tokens
+    return tokens
+
+
+def to_payload(message):
+    return {"role": message["role"], "content": message["content"]}
+
+
+class ContextPacker:
+    def __init__(self, context_limits, default_limit, reserve_tokens):
+        self.context_limits = context_limits  # model id -> context window in tokens
+        self.default_limit = default_limit
+        self.reserve_tokens = reserve_tokens  # left free for the reply
+        self.summary = ""
+        self.summary_tokens = 0
+        self.summary_upto = 0                 # messages[:summary_upto] are folded into summary
+        self.retrieval = None                 # RetrievalIndex keyed by message index
+        self.recall_k = 6
+        self.recall_tokens = 2000             # most of the budget recalled chunks may take
+
+    def budget_for(self, model):
+        return self.context_limits.get(model, self.default_limit) - self.reserve_tokens
+
+    def set_summary(self, summary, upto):
+        if upto < self.summary_upto:
+            return
+        self.summary = summary
+        self.summary_tokens = estimate_tokens(summary) + MESSAGE_OVERHEAD_TOKENS if summary else 0
+        self.summary_upto = upto
+
+    def pack(self, messages, model):
+        # Returns (payload messages, index of the first history message kept).
+        # System messages are always kept, then the newest turns that fit; the
+        # latest message is sent even if it alone exceeds the budget.
+        budget = self.budget_for(model)
+        system = [m for m in messages if m["role"] == "system"]
+        budget -= sum(message_tokens(m) for m in system)
+        if self.summary:
+            budget -= self.summary_tokens
+
+        kept, first_kept, used = self._newest(messages, budget)
+        recalled = ""
+        if self.retrieval is not None and messages:
+            # Only chunks of messages left out are candidates, so nothing is sent
+            # twice. Making room for the recalled text can leave out more turns,
+            # which are then candidates too, so this repeats until both settle.
+            while True:
+                recalled = self.retrieval.recall(messages[-1]["content"], first_kept,
+                                                 self.recall_k, self.recall_tokens)
+                cost = estimate_tokens(RECALL_HEADER + recalled) + MESSAGE_OVERHEAD_TOKENS if recalled else 0
+                if used + cost <= budget:
+                    break
+                kept, new_first_kept, used = self._newest(messages, budget - cost)
+                if new_first_kept == first_kept:
+                    break
+                first_kept = new_first_kept
+
+        payload = [to_payload(m) for m in system]
+        if self.summary and self.summary_upto > 0:
+            payload.append({"role": "system",
+                            "content": f"Summary of the earlier conversation:\n{self.summary}"})
+        if recalled:
+            payload.append({"role": "system",
+                            "content": RECALL_HEADER + recalled})
+        payload.extend(to_payload(m) for m in kept)
+        return payload, first_kept
+
+    def _newest(self, messages, budget):
+        # The newest non-system messages that fit: (messages, first index kept, tokens used)
+        kept = []
+        used = 0
+        first_kept = len(messages)
+        for index in range(len(messages) - 1, -1, -1):
+            message = messages[index]
+            if message["role"] == "system":
+                continue
+            cost = message_tokens(message)
+            if kept and used + cost > budget:
+                break
+            used += cost
+            kept.append(message)
+            first_kept = index
+        kept.reverse()
+        return kept, first_kept, used
+
+    def summary_request(self, messages, first_kept):
+        # Messages dropped from the request but not yet folded into the
+        # summary; returns (prompt messages, new summary_upto) or None.
+        pending = [m for m in messages[self.summary_upto:first_kept] if m["role"] != "system"]
+        if not pending:
+            return None
+        transcript = "\n\n".join(f"{m['role'].upper()}: {m['content']}" for m in pending)
+        prompt = ("Update the running summary of a conversation with the new turns below. "
+                  "Keep facts, decisions, code identifiers and open questions; be concise.\n\n"
+                  f"Current summary:\n{self.summary or '(empty)'}\n\nNew turns:\n{transcript}")
+        return [{"role": "user", "content": prompt}], first_kept
@@ -0,0 +1,522 @@
+# Asyncio request engine
+# A single event loop runs on a background thread and owns every in-flight
+# stream. The GUI submits work from the Qt thread and gets results back through
+# a listener object (see EngineSignals in main.py, which re-emits them as Qt
+# signals so they are delivered on the GUI thread). Nothing here imports Qt,
+# so cli.py drives the same engine without a display.
+
+import asyncio
+import itertools
+import json
+import random
+import re
+import threading
+
+import httpx
+
+try:
+    import orjson
+    _dumps = orjson.dumps
+except ImportError:
+    def _dumps(obj):
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+from response_cache import cache_key
+from sse import SSEDecoder, SSEError, iter_deltas
+
+STREAM_PARAMS = {"stream": True, "max_tokens": 4096}
+REPLAY_TOKEN_RE = re.compile(r"\s*\S+|\s+")  # word-sized pieces for cache replay
+RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+_END = object()  # end-of-stream marker on an attempt's queue
+
+
+def create_client(base_url, http2=True, max_connections=10, max_keepalive=5, keepalive_expiry=120.0,
+                  connect_timeout=10.0, read_timeout=60.0):
+    # One pooled client per process; HTTP/2 only when the optional "h2" package is installed
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            http2 = False
+
+    return httpx.AsyncClient(
+        base_url=base_url,
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+        headers={
+            "HTTP-Referer": "http://localhost",
+            "X-Title": "AI Chat Python",
+        },
+    )
+
+
+class RequestEncoder:
+    # Builds request bodies from per-message JSON kept between requests, so a
+    # new turn only encodes the new message. Keys are (role, content): the
+    # content strings are the same objects from one request to the next, so
+    # their hashes are cached and lookups compare by identity first.
+    def __init__(self, max_bytes=8 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.encoded = {}  # (role, content) -> bytes, least recently used first
+        self.size = 0
+
+    def message(self, message):
+        content = message.get("content")
+        if len(message) != 2 or not isinstance(content, str):
+            return _dumps(message)  # names, images, ...: not worth keeping
+        key = (message["role"], content)
+        encoded = self.encoded.pop(key, None)
+        if encoded is None:
+            encoded = _dumps(message)
+            self.size += len(encoded)
+        self.encoded[key] = encoded
+        while self.size > self.max_bytes and len(self.encoded) > 1:
+            self.size -= len(self.encoded.pop(next(iter(self.encoded))))
+        return encoded
+
+    def encode(self, model, messages, params):
+        head = _dumps({"model": model, **params})
+        return head[:-1] + b',"messages":[' + b",".join(self.message(m) for m in messages) + b"]}"
+
+
+def _has_output(delta):
+    return bool(delta.content or delta.reasoning or delta.tool_calls or delta.finish_reason or delta.usage)
+
+
+class StreamError(Exception):
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+    @property
+    def retryable(self):
+        return self.status is None or self.status in RETRY_STATUS
+
+
+class StreamHandle:
+    def __init__(self, stream_id, model):
+        self.id = stream_id
+        self.model = model            # the model that answered, once one has
+        self.requested_model = model
+        self.attempts = 0
+        self.sent_at = None           # loop time the answering request was sent
+        self.ttfb = None
+        self.ttft = None
+        self.future = None
+        self.group = None
+        self.cancelled = False
+        self.succeeded = False
+        self.finish_reason = None
+        self.usage = None
+        self.cached = False
+        self.params = {}              # extra request fields, e.g. temperature
+
+    def cancel(self):
+        self.cancelled = True
+        if self.future is not None:
+            self.future.cancel()
+
+
+class StreamGroup:
+    # Streams started together for one prompt (one per compared model)
+    def __init__(self, stop_others_on_finish=False):
+        self.handles = []
+        self.stop_others_on_finish = stop_others_on_finish
+
+    def cancel(self):
+        for handle in self.handles:
+            handle.cancel()
+
+    def on_member_finished(self, handle):
+        if handle.succeeded and self.stop_others_on_finish:
+            for other in self.handles:
+                if other is not handle:
+                    other.cancel()
+
+
+class _Attempt:
+    # One request to one model. Its task pumps deltas into the queue so the
+    # dispatcher can watch several attempts and keep only the first to answer.
+    def __init__(self, model, messages, tries, ready_at):
+        self.model = model
+        self.messages = messages
+        self.tries = tries
+        self.ready_at = ready_at      # loop time the request is sent (after backoff)
+        self.response_at = None       # loop time the response headers arrived
+        self.queue = asyncio.Queue()
+        self.task = None
+        self.getter = None
+        self.opening = []             # deltas before the first one with output (role-only chunks)
+
+    def cancel(self):
+        self.task.cancel()
+        self.getter.cancel()
+
+
+class StreamEngine:
+    def __init__(self, client):
+        self.client = client
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run_loop, name="stream-engine", daemon=True)
+        self._ids = itertools.count(1)
+        self._handles = set()
+        # Optional ResponseCache; replay speed 0 delivers a cached answer at once
+        self.cache = None
+        self.cache_enabled = False
+        self.replay_tokens_per_sec = 0
+        # Failover: retries per model on 429/5xx/stalls, then the next fallback
+        self.max_retries = 0
+        self.backoff_base = 0.5
+        self.backoff_max = 8.0
+        self.stall_timeout = None     # seconds without a first token before an attempt is dropped
+        self.hedge_after = None       # seconds before the next fallback is raced alongside
+        # Optional Telemetry; receives one sample per stream and per failed attempt
+        self.telemetry = None
+        # Optional RateLimiter; a request that would wait longer than
+        # reroute_after goes to the next fallback instead, if there is one
+        self.rate_limiter = None
+        self.reroute_after = 5.0
+        self.encoder = RequestEncoder()
+        # warm_up only reconnects after this many seconds without a request
+        self.warmup_idle = 20.0
+        self.last_request_at = None   # loop time of the last request sent
+        self._warming = False
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def start(self):
+        self.thread.start()
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def close(self, timeout=5.0):
+        for handle in list(self._handles):
+            handle.cancel()
+        try:
+            self.submit(self._shutdown()).result(timeout)
+        except Exception:
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout)
+
+    async def _shutdown(self):
+        # Let cancelled streams unwind and close their generators before the loop stops
+        current = asyncio.current_task()
+        tasks = [task for task in asyncio.all_tasks() if task is not current]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.client.aclose()
+        await self.loop.shutdown_asyncgens()
+
+    # --- Warm-up ---
+
+    def warm_up(self, api_key):
+        # Called while the user types: if the pool may have gone cold, make a
+        # free request (GET /key) so the next send finds an open connection
+        self.submit(self._warm_up(api_key))
+
+    async def _warm_up(self, api_key):
+        now = self.loop.time()
+        if self._warming or self._handles or (
+                self.last_request_at is not None and now - self.last_request_at < self.warmup_idle):
+            return
+        self._warming = True
+        self.last_request_at = now
+        try:
+            response = await self.client.get("/key", headers={"Authorization": f"Bearer {api_key}"})
+            await response.aclose()
+        except httpx.HTTPError:
+            pass  # the real request will report it
+        finally:
+            self._warming = False
+
+    def pre_encode(self, messages):
+        # Encodes the history the next request will start with ahead of time
+        self.loop.call_soon_threadsafe(lambda: [self.encoder.message(m) for m in messages])
+
+    # --- Streaming ---
+
+    def stream_chat(self, api_key, model, messages, listener, group=None, fallbacks=(), params=None):
+        # fallbacks: [(model, messages), ...] tried in order when model fails
+        handle = StreamHandle(f"s{next(self._ids)}", model)
+        handle.params = params or {}
+        if group is not None:
+            handle.group = group
+            group.handles.append(handle)
+        self._handles.add(handle)
+        candidates = [(model, messages), *fallbacks]
+        handle.future = self.submit(self._run_stream(handle, api_key, candidates, listener))
+        return handle
+
+    def fan_out(self, api_key, requests, listener, stop_others_on_finish=False):
+        # requests: [(model, messages), ...], messages packed for each model
+        group = StreamGroup(stop_others_on_finish)
+        for model, messages in requests:
+            self.stream_chat(api_key, model, messages, listener, group)
+        return group
+
+    def complete(self, api_key, model, messages, max_tokens=1024):
+        # Non-streaming request for background jobs; returns a
+        # concurrent.futures.Future resolving to the reply text.
+        return self.submit(self._complete(api_key, model, messages, max_tokens))
+
+    async def _complete(self, api_key, model, messages, max_tokens):
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+        data = {
+            "model": model,
+            "messages": messages,
+            "max_tokens": max_tokens
+        }
+        if self.rate_limiter is not None:
+            await asyncio.sleep(self.rate_limiter.reserve(api_key, model))
+        self.last_request_at = self.loop.time()
+        response = await self.client.post("/chat/completions", headers=headers, json=data)
+        if self.rate_limiter is not None:
+            self.rate_limiter.update(api_key, model, response.status_code, response.headers)
+        if response.status_code != 200:
+            raise StreamError(f"Error: {response.status_code} - {response.text}", response.status_code)
+        choices = response.json().get("choices") or []
+        if not choices:
+            raise StreamError("Error: empty response")
+        return choices[0].get("message", {}).get("content") or ""
+
+    async def _run_stream(self, handle, api_key, candidates, listener):
+        loop = asyncio.get_running_loop()
+        gaps = []
+        first_token_at = last_token_at = None
+        content = []
+        tool_calls = False
+        # Optional: listeners that relay the raw stream (gateway.py) also get
+        # the reasoning and tool-call deltas
+        on_delta = getattr(listener, "on_delta", None)
+        try:
+            if handle.cancelled:
+                raise asyncio.CancelledError()
+
+            use_cache = self.cache is not None and self.cache_enabled
+            if use_cache:
+                key = cache_key(handle.model, candidates[0][1], {**STREAM_PARAMS, **handle.params})
+                entry = await asyncio.to_thread(self.cache.get, key)
+                if entry is not None:
+                    handle.cached = True
+                    await self._replay(handle, entry, listener)
+                    handle.succeeded = True
+                    return
+
+            async for delta in self._dispatch(handle, api_key, candidates):
+                if delta.content:
+                    now = loop.time()
+                    if first_token_at is None:
+                        first_token_at = now
+                        handle.ttft = now - handle.sent_at
+                    else:
+                        gaps.append(now - last_token_at)
+                    last_token_at = now
+                    content.append(delta.content)
+                    listener.on_token(handle, delta.content)
+                if delta.reasoning or delta.tool_calls:
+                    tool_calls = tool_calls or bool(delta.tool_calls)
+                    if on_delta is not None:
+                        on_delta(handle, delta)
+                if delta.finish_reason:
+                    handle.finish_reason = delta.finish_reason
+                if delta.usage:
+                    handle.usage = delta.usage
+            handle.succeeded = True
+
+            # Only plain answers are cached: an entry has no room for tool calls
+            if use_cache and content and not tool_calls:
+                key = cache_key(handle.model, dict(candidates)[handle.model], {**STREAM_PARAMS, **handle.params})
+                entry = {"model": handle.model, "content": "".join(content),
+                         "finish_reason": handle.finish_reason, "usage": handle.usage}
+                await asyncio.to_thread(self.cache.put, key, entry)
+        except asyncio.CancelledError:
+            handle.cancelled = True
+        except (StreamError, SSEError) as e:
+            listener.on_error(handle, str(e))
+        except Exception as e:
+            listener.on_error(handle, f"Connection Error: {str(e)}")
+        finally:
+            self._handles.discard(handle)
+            if self.telemetry is not None and handle.sent_at is not None:
+                self.telemetry.record(
+                    handle.model, handle.ttfb, handle.ttft, gaps,
+                    duration=last_token_at - first_token_at if first_token_at is not None else None,
+                    tokens=len(content), usage=handle.usage,
+                    error=not handle.succeeded and not handle.cancelled,
+                    cancelled=handle.cancelled and not handle.succeeded)
+            if handle.group is not None:
+                handle.group.on_member_finished(handle)
+            listener.on_finished(handle)
+
+    # --- Failover ---
+
+    async def _dispatch(self, handle, api_key, candidates):
+        # Yields the deltas of the first attempt to produce one and sets
+        # handle.model to its model. Failed or stalled attempts are retried with
+        # jittered backoff, then the next candidate takes over; with hedging, a
+        # slow first token starts the next candidate alongside and the loser is
+        # cancelled.
+        loop = asyncio.get_running_loop()
+        attempts = []
+        remaining = list(candidates)
+        hedged = False
+        last_error = None
+
+        def quota_wait(model):
+            return self.rate_limiter.wait_time(api_key, model) if self.rate_limiter is not None else 0.0
+
+        def start(model, messages, tries=0):
+            delay = 0.0
+            if tries:
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** tries))
+            if self.rate_limiter is not None:
+                delay = max(delay, self.rate_limiter.reserve(api_key, model))
+            attempt = _Attempt(model, messages, tries, loop.time() + delay)
+            attempt.task = loop.create_task(self._pump(api_key, attempt, delay, handle.params))
+            attempt.getter = loop.create_task(attempt.queue.get())
+            attempts.append(attempt)
+            handle.attempts += 1
+
+        def start_next():
+            # The first candidate with quota to spare, or else the one that waits least
+            waits = [quota_wait(model) for model, _ in remaining]
+            index = next((i for i, wait in enumerate(waits) if wait <= self.reroute_after),
+                         waits.index(min(waits)))
+            start(*remaining.pop(index))
+
+        def failed(attempt, error):
+            nonlocal last_error
+            last_error = error
+            attempts.remove(attempt)
+            if self.telemetry is not None:
+                self.telemetry.record(attempt.model, error=True)
+            status = getattr(error, "status", None)
+            retryable = getattr(error, "retryable", True)
+            rerouted = remaining and quota_wait(attempt.model) > self.reroute_after
+            if retryable and attempt.tries < self.max_retries and not rerouted:
+                start(attempt.model, attempt.messages, attempt.tries + 1)
+            elif not attempts and remaining and status != 401:
+                start_next()
+
+        start_next()
+        winner = None
+        try:
+            while winner is None:
+                if not attempts:
+                    raise last_error
+                deadlines = []
+                if self.stall_timeout is not None:
+                    deadlines += [a.ready_at + self.stall_timeout for a in attempts]
+                if self.hedge_after is not None and not hedged and len(attempts) == 1 and remaining:
+                    deadlines.append(attempts[0].ready_at + self.hedge_after)
+                timeout = max(0.0, min(deadlines) - loop.time()) if deadlines else None
+                getters = {a.getter: a for a in attempts}
+                done, _ = await asyncio.wait(getters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                for getter in done:
+                    attempt = getters[getter]
+                    item = getter.result()
+                    if isinstance(item, Exception):
+                        failed(attempt, item)
+                    elif winner is not None:
+                        continue
+                    elif item is _END or _has_output(item):
+                        winner, first = attempt, item
+                    else:
+                        # Headers and an empty opening chunk are not an answer yet:
+                        # stall and hedge deadlines keep running
+                        attempt.opening.append(item)
+                        attempt.getter = loop.create_task(attempt.queue.get())
+                if winner is not None:
+                    break
+
+                now = loop.time()
+                for attempt in list(attempts):
+                    if self.stall_timeout is not None and now >= attempt.ready_at + self.stall_timeout:
+                        attempt.cancel()
+                        failed(attempt, StreamError(f"Error: {attempt.model} sent nothing for {self.stall_timeout:.0f}s"))
+                if (self.hedge_after is not None and not hedged and len(attempts) == 1 and remaining
+                        and now >= attempts[0].ready_at + self.hedge_after):
+                    hedged = True
+                    start_next()
+
+            for attempt in attempts:
+                if attempt is not winner:
+                    attempt.cancel()
+            handle.model = winner.model
+            handle.sent_at = winner.ready_at
+            if winner.response_at is not None:
+                handle.ttfb = winner.response_at - winner.ready_at
+            for item in winner.opening:
+                yield item
+            item = first
+            while item is not _END:
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+                item = await winner.queue.get()
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+
+    async def _pump(self, api_key, attempt, delay, params):
+        if delay:
+            await asyncio.sleep(delay)
+        try:
+            async for delta in self._stream_deltas(api_key, attempt.model, attempt.messages, attempt, params):
+                attempt.queue.put_nowait(delta)
+            attempt.queue.put_nowait(_END)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            attempt.queue.put_nowait(e)
+
+    async def _replay(self, handle, entry, listener):
+        # Cached answers go through the same listener path as live tokens
+        handle.finish_reason = entry.get("finish_reason")
+        handle.usage = entry.get("usage")
+        if self.replay_tokens_per_sec <= 0:
+            listener.on_token(handle, entry["content"])
+            return
+        delay = 1.0 / self.replay_tokens_per_sec
+        for token in REPLAY_TOKEN_RE.findall(entry["content"]):
+            listener.on_token(handle, token)
+            await asyncio.sleep(delay)
+
+    async def _stream_deltas(self, api_key, model, messages, attempt=None, params=None):
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+        body = self.encoder.encode(model, messages, {**STREAM_PARAMS, **(params or {})})
+
+        self.last_request_at = self.loop.time()
+        async with self.client.stream("POST", "/chat/completions", headers=headers, content=body) as response:
+            if attempt is not None:
+                attempt.response_at = asyncio.get_running_loop().time()
+            if self.rate_limiter is not None:
+                self.rate_limiter.update(api_key, model, response.status_code, response.headers)
+            if response.status_code != 200:
+                body = await response.aread()
+                raise StreamError(f"Error: {response.status_code} - {body.decode(errors='replace')}",
+                                  response.status_code)
+
+            decoder = SSEDecoder()
+            async for chunk in response.aiter_bytes():
+                for delta in iter_deltas(decoder, chunk):
+                    if delta is None:
+                        return
+                    yield delta
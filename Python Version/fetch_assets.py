@@ -0,0 +1,41 @@
+# Downloads the chat page's third-party assets into web/vendor so the app
+# starts and renders markdown without network access. The Outfit font ships
+# with the repo and is not fetched.
+# Run once after installing: python "Python Version/fetch_assets.py"
+
+import os
+import sys
+
+import httpx
+
+import assets
+
+VENDOR_DIR = os.path.join(assets.WEB_DIR, "vendor")
+
+
+def download(client, url, path):
+    response = client.get(url)
+    response.raise_for_status()
+    with open(path, "wb") as f:
+        f.write(response.content)
+    print(f"  {os.path.relpath(path, assets.WEB_DIR)} ({len(response.content) // 1024} KB)")
+    return response
+
+
+def main():
+    os.makedirs(VENDOR_DIR, exist_ok=True)
+    print(f"Fetching assets into {VENDOR_DIR}")
+    try:
+        with httpx.Client(timeout=30.0, follow_redirects=True) as client:
+            for name, url in assets.VENDOR_ASSETS.items():
+                download(client, url, os.path.join(VENDOR_DIR, name))
+    except httpx.HTTPError as e:
+        print(f"Download failed: {e}")
+        return 1
+    assets.write_chat_page()
+    print("Done.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
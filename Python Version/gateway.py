@@ -0,0 +1,324 @@
+# Local OpenAI-compatible gateway
+# Lets several clients (the desktop app, scripts, the web version) share one
+# API key and one upstream connection pool. /v1/chat/completions runs on the
+# same StreamEngine as the app, and identical requests in flight at the same
+# time share one upstream stream that is fanned out to every client that
+# asked for it. /v1/models is cached and revalidated with its ETag. Upstream
+# traffic then grows with the number of distinct requests, not of clients.
+# Clients' own API keys are ignored; the gateway's key is used for everything.
+# Usage: python "Python Version/gateway.py" [--port 8787], then point clients at
+# http://127.0.0.1:8787/v1 (for the app: AICHAT_API_BASE_URL=http://127.0.0.1:8787/v1)
+
+import argparse
+import asyncio
+import hashlib
+import itertools
+import json
+import re
+import sys
+import time
+
+from config import API_BASE_URL, load_api_key
+from engine import StreamEngine, create_client
+from httpserver import HTTPServer
+from ratelimit import RateLimiter
+from response_cache import cache_key
+
+MODELS_TTL = 300.0  # seconds the model list is served before it is revalidated upstream
+MAX_BODY_BYTES = 50 * 1024 * 1024
+ERROR_STATUS_RE = re.compile(r"Error: (\d{3}) ")
+# Request fields the engine sets itself; everything else is passed upstream
+ENGINE_FIELDS = {"model", "messages", "stream", "stream_options"}
+
+
+class Flight:
+    # One upstream stream and the clients reading it
+    def __init__(self, key, model, flight_id):
+        self.key = key
+        self.id = flight_id
+        self.model = model
+        self.created = int(time.time())
+        self.handle = None
+        self.events = []          # encoded SSE events so far, replayed to clients that join late
+        self.started = False      # any output sent yet
+        self.content = []
+        self.reasoning = []
+        self.tool_calls = []      # merged from the streamed parts, for non-streaming clients
+        self.subscribers = set()  # one queue per client; None marks the end
+        self.error = None
+        self.done = False
+
+    def publish(self, event):
+        self.events.append(event)
+        for queue in self.subscribers:
+            queue.put_nowait(event)
+
+    def send_delta(self, delta):
+        if not self.started:
+            delta["role"] = "assistant"
+            self.started = True
+        self.publish(self.chunk(delta))
+
+    def merge_tool_calls(self, parts):
+        # Streamed tool calls arrive in pieces keyed by index; the arguments
+        # string is split across them
+        for part in parts:
+            index = part.get("index", len(self.tool_calls))
+            while len(self.tool_calls) <= index:
+                self.tool_calls.append({"id": None, "type": "function", "function": {"name": "", "arguments": ""}})
+            call = self.tool_calls[index]
+            call["id"] = part.get("id") or call["id"]
+            call["type"] = part.get("type") or call["type"]
+            function = part.get("function") or {}
+            call["function"]["name"] += function.get("name") or ""
+            call["function"]["arguments"] += function.get("arguments") or ""
+
+    def chunk(self, delta, finish_reason=None, usage=None):
+        data = {"id": self.id, "object": "chat.completion.chunk", "created": self.created, "model": self.model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+        if usage:
+            data["usage"] = usage
+        return b"data: " + json.dumps(data, ensure_ascii=False).encode() + b"\n\n"
+
+
+class Gateway(HTTPServer):
+    max_body_bytes = MAX_BODY_BYTES
+
+    def __init__(self, engine, api_key, host="127.0.0.1", port=8787, models_ttl=MODELS_TTL, verbose=True):
+        super().__init__(host, port)
+        self.engine = engine
+        self.api_key = api_key
+        self.models_ttl = models_ttl
+        self.verbose = verbose
+        self.flights = {}          # request key -> Flight in progress
+        self.handles = {}          # stream id -> Flight
+        self._ids = itertools.count(1)
+        self.models_body = None
+        self.models_etag = None    # ours, over the body we serve
+        self.upstream_etag = None
+        self.models_fetched = 0.0
+        self.models_task = None
+        self.stats = {"chat_requests": 0, "chat_upstream": 0, "chat_coalesced": 0,
+                      "models_requests": 0, "models_upstream": 0}
+
+    # start() and close() run on the engine's loop, which is also where
+    # listener callbacks arrive
+
+    def log(self, message):
+        if self.verbose:
+            print(message, file=sys.stderr)
+
+    # --- Engine listener ---
+
+    def on_token(self, handle, token):
+        flight = self.handles[handle.id]
+        flight.model = handle.model
+        flight.content.append(token)
+        flight.send_delta({"content": token})
+
+    def on_delta(self, handle, delta):
+        # Reasoning and tool calls are relayed as they came
+        flight = self.handles[handle.id]
+        flight.model = handle.model
+        fields = {}
+        if delta.reasoning:
+            flight.reasoning.append(delta.reasoning)
+            fields["reasoning"] = delta.reasoning
+        if delta.tool_calls:
+            flight.merge_tool_calls(delta.tool_calls)
+            fields["tool_calls"] = delta.tool_calls
+        flight.send_delta(fields)
+
+    def on_error(self, handle, message):
+        self.handles[handle.id].error = message
+
+    def on_finished(self, handle):
+        flight = self.handles.pop(handle.id)
+        flight.model = handle.model
+        if handle.succeeded:
+            flight.publish(flight.chunk({}, handle.finish_reason or "stop", handle.usage))
+            flight.publish(b"data: [DONE]\n\n")
+        elif flight.error is not None and flight.started:
+            # Same shape as an error OpenRouter sends mid-stream
+            flight.publish(b"data: " + json.dumps({"error": {"message": flight.error}}).encode() + b"\n\n")
+        flight.done = True
+        for queue in flight.subscribers:
+            queue.put_nowait(None)
+        if self.flights.get(flight.key) is flight:
+            del self.flights[flight.key]
+
+    # --- HTTP ---
+
+    async def route(self, method, path, headers, body, writer):
+        if method == "GET" and path == "/v1/models":
+            await self.models(headers, writer)
+        elif method == "POST" and path == "/v1/chat/completions":
+            try:
+                request = json.loads(body or b"{}")
+                model, messages = request["model"], request["messages"]
+            except (ValueError, KeyError, TypeError):
+                await self.send_error(writer, 400, "expected a JSON body with model and messages")
+                return
+            await self.chat_completions(request, model, messages, writer)
+        elif method == "GET" and path == "/gateway/stats":
+            stats = {**self.stats, "in_flight": len(self.flights)}
+            await self.send(writer, 200, json.dumps(stats).encode(), {"Content-Type": "application/json"})
+        else:
+            await self.send_error(writer, 404, "not found")
+
+    # --- Chat completions ---
+
+    def join(self, model, messages, params):
+        # The flight for this request, started upstream only if none is in progress
+        key = cache_key(model, messages, params)
+        self.stats["chat_requests"] += 1
+        flight = self.flights.get(key)
+        if flight is not None:
+            self.stats["chat_coalesced"] += 1
+            self.log(f"{model}: joined {flight.id} ({len(flight.subscribers) + 1} clients)")
+            return flight
+        self.stats["chat_upstream"] += 1
+        flight = self.flights[key] = Flight(key, model, f"chatcmpl-gw{next(self._ids)}")
+        flight.handle = self.engine.stream_chat(self.api_key, model, messages, self, params=params)
+        self.handles[flight.handle.id] = flight
+        self.log(f"{model}: started {flight.id}")
+        return flight
+
+    async def chat_completions(self, request, model, messages, writer):
+        params = {name: value for name, value in request.items() if name not in ENGINE_FIELDS}
+        flight = self.join(model, messages, params)
+        queue = asyncio.Queue()
+        for event in flight.events:
+            queue.put_nowait(event)
+        flight.subscribers.add(queue)
+        try:
+            first = await queue.get()
+            if first is None and not flight.started:
+                # Nothing was sent yet, so the client sees the upstream status
+                error = flight.error or "the request was cancelled"
+                match = ERROR_STATUS_RE.match(error)
+                await self.send_error(writer, int(match.group(1)) if match else 502, error)
+            elif request.get("stream"):
+                await self.stream_events(first, queue, writer)
+            else:
+                while first is not None:
+                    first = await queue.get()
+                await self.send_completion(flight, writer)
+        finally:
+            flight.subscribers.discard(queue)
+            if not flight.subscribers and not flight.done:
+                self.log(f"{flight.model}: every client left {flight.id}; cancelling")
+                flight.handle.cancel()
+
+    async def stream_events(self, event, queue, writer):
+        await self.start_stream(writer)
+        while event is not None:
+            # Send everything already queued in one chunk
+            events = [event]
+            while events[-1] is not None and not queue.empty():
+                events.append(queue.get_nowait())
+            ended = events[-1] is None
+            if ended:
+                events.pop()
+            await self.write_chunk(writer, b"".join(events))
+            event = None if ended else await queue.get()
+        await self.write_chunk(writer, b"")
+
+    async def send_completion(self, flight, writer):
+        handle = flight.handle
+        message = {"role": "assistant", "content": "".join(flight.content)}
+        if flight.reasoning:
+            message["reasoning"] = "".join(flight.reasoning)
+        if flight.tool_calls:
+            message["tool_calls"] = flight.tool_calls
+            message["content"] = message["content"] or None
+        reply = {"id": flight.id, "object": "chat.completion", "created": flight.created, "model": flight.model,
+                 "choices": [{"index": 0, "message": message,
+                              "finish_reason": handle.finish_reason or ("stop" if handle.succeeded else "error")}]}
+        if handle.usage:
+            reply["usage"] = handle.usage
+        await self.send(writer, 200, json.dumps(reply, ensure_ascii=False).encode(),
+                        {"Content-Type": "application/json"})
+
+    # --- Models ---
+
+    async def models(self, headers, writer):
+        self.stats["models_requests"] += 1
+        if self.models_body is None or time.monotonic() - self.models_fetched > self.models_ttl:
+            # One refresh at a time; everyone asking meanwhile waits for it
+            if self.models_task is None:
+                self.models_task = asyncio.ensure_future(self.refresh_models())
+            try:
+                await asyncio.shield(self.models_task)
+            except Exception as e:
+                if self.models_body is None:
+                    await self.send_error(writer, 502, f"model list unavailable: {e}")
+                    return
+                # Otherwise the last list is served until the API is back
+        if headers.get("if-none-match") == self.models_etag:
+            await self.send(writer, 304, b"", {"ETag": self.models_etag})
+        else:
+            await self.send(writer, 200, self.models_body,
+                            {"Content-Type": "application/json", "ETag": self.models_etag})
+
+    async def refresh_models(self):
+        try:
+            headers = {"Authorization": f"Bearer {self.api_key}"}
+            if self.upstream_etag:
+                headers["If-None-Match"] = self.upstream_etag
+            self.stats["models_upstream"] += 1
+            response = await self.engine.client.get("/models", headers=headers)
+            if response.status_code == 200:
+                self.models_body = response.content
+                self.models_etag = f'"{hashlib.sha256(response.content).hexdigest()[:32]}"'
+                self.upstream_etag = response.headers.get("ETag")
+            elif response.status_code != 304:
+                raise RuntimeError(f"{response.status_code} from upstream")
+            self.models_fetched = time.monotonic()
+            self.log("models: refreshed" if response.status_code == 200 else "models: unchanged")
+        finally:
+            self.models_task = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible gateway to OpenRouter")
+    parser.add_argument("--host", default="127.0.0.1", help="use 0.0.0.0 to serve other machines")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--connections", type=int, default=10, help="upstream connection pool size")
+    parser.add_argument("--retries", type=int, default=2, help="retries per request on 429/5xx/stalls")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds without data before giving up")
+    parser.add_argument("--rpm", type=float, default=20, help="requests per minute per model until the API says otherwise")
+    parser.add_argument("--models-ttl", type=float, default=MODELS_TTL)
+    parser.add_argument("--base-url", default=API_BASE_URL)
+    parser.add_argument("--api-key-file", help="default: $OPENROUTER_API_KEY, then APIKEY.txt")
+    parser.add_argument("-q", "--quiet", action="store_true")
+    args = parser.parse_args()
+
+    api_key = load_api_key(args.api_key_file)
+    if not api_key:
+        print("No API key: set OPENROUTER_API_KEY or create APIKEY.txt", file=sys.stderr)
+        return 2
+
+    engine = StreamEngine(create_client(args.base_url, max_connections=args.connections,
+                                        max_keepalive=args.connections, read_timeout=args.timeout))
+    engine.max_retries = args.retries
+    engine.stall_timeout = args.timeout
+    engine.rate_limiter = RateLimiter(args.rpm)
+    engine.start()
+    gateway = Gateway(engine, api_key, args.host, args.port, args.models_ttl, not args.quiet)
+    try:
+        engine.submit(gateway.start()).result()
+        print(f"Gateway listening on http://{args.host}:{gateway.port}/v1", file=sys.stderr)
+        while True:
+            time.sleep(1)  # short sleeps keep Ctrl+C working on Windows
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if gateway.server is not None:
+            engine.submit(gateway.close()).result(5)
+        engine.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+# Minimal asyncio HTTP/1.1 server shared by gateway.py and mock_openrouter.py
+# Keep-alive connections, request bodies with a Content-Length, and chunked
+# responses for SSE streams; enough for httpx, browsers and QtWebEngine.
+# Subclasses implement route(). Only the standard library is used.
+
+import asyncio
+import json
+
+REASONS = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large",
+           429: "Too Many Requests", 500: "Internal Server Error", 502: "Bad Gateway", 503: "Service Unavailable"}
+
+
+class HTTPServer:
+    max_body_bytes = None  # larger requests get a 413 and the connection is closed
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.host = host
+        self.port = port
+        self.server = None
+        self.requests = 0
+        self.connections = set()  # handler tasks, cancelled on close
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def close(self):
+        self.server.close()
+        for task in self.connections:
+            task.cancel()
+        await asyncio.gather(*self.connections, return_exceptions=True)
+        await self.server.wait_closed()
+
+    async def handle_connection(self, reader, writer):
+        task = asyncio.current_task()
+        self.connections.add(task)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                if self.max_body_bytes is not None and length > self.max_body_bytes:
+                    await self.send_error(writer, 413, "request body too large")
+                    break
+                body = await reader.readexactly(length)
+                self.requests += 1
+                await self.route(method, path.split("?")[0], headers, body, writer)
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        except asyncio.CancelledError:
+            pass  # close(); asyncio's stream callback logs handlers that end cancelled
+        finally:
+            self.connections.discard(task)
+            writer.close()
+
+    async def route(self, method, path, headers, body, writer):
+        raise NotImplementedError
+
+    async def send(self, writer, status, body, headers=None):
+        head = [f"HTTP/1.1 {status} {REASONS.get(status, 'Status')}", f"Content-Length: {len(body)}"]
+        head += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def send_error(self, writer, status, message):
+        body = json.dumps({"error": {"code": status, "message": message}}).encode()
+        await self.send(writer, status, body, {"Content-Type": "application/json"})
+
+    async def start_stream(self, writer):
+        # Headers of a chunked text/event-stream response; end it with write_chunk(writer, b"")
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                     b"Cache-Control: no-cache\r\nTransfer-Encoding: chunked\r\n\r\n")
+        await writer.drain()
+
+    async def write_chunk(self, writer, data):
+        writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        await writer.drain()
@@ -1,17 +1,90 @@
+import time
+STARTUP_T0 = time.perf_counter()
+
+import asyncio
 import sys
 import os
-import json
-import httpx
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                                QHBoxLayout, QTextEdit, QPushButton, QComboBox, 
-                               QLabel, QMessageBox, QFrame)
-from PySide6.QtWebEngineWidgets import QWebEngineView
-from PySide6.QtCore import QUrl, Slot, Signal, QThread, Qt
+                               QLabel, QMessageBox, QFrame, QToolButton, QMenu,
+                               QDialog, QLineEdit, QListWidget, QListWidgetItem,
+                               QTableWidget, QTableWidgetItem, QFileDialog, QHeaderView,
+                               QStackedWidget)
+from PySide6.QtCore import QObject, QUrl, Slot, Signal, QTimer, Qt
 from PySide6.QtGui import QIcon, QFont
 import assets
+from bridge import ChatBridge
+from context import ContextPacker, message_tokens
+from engine import StreamEngine, create_client
+from model_catalog import ModelCatalog
+from ratelimit import RateLimiter
+from response_cache import ResponseCache
+from retrieval import RetrievalIndex
+from store import PAGE_SIZE, ConversationStore
+from telemetry import Telemetry
+from transcript import TranscriptModel
 
 # --- Configuration ---
-MAX_CONTEXT_MESSAGES = 10
+TOKEN_FLUSH_INTERVAL_MS = 16  # Push buffered tokens to the WebView at most once per frame
+DATA_DIR = os.environ.get("AICHAT_DATA_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+API_BASE_URL = os.environ.get("AICHAT_API_BASE_URL") or "https://openrouter.ai/api/v1"  # e.g. mock_openrouter.py
+WEB_CACHE_MAX_BYTES = 50 * 1024 * 1024  # Disk cache for page assets fetched from the CDN fallback
+MEASURE_STARTUP = os.environ.get("AICHAT_MEASURE_STARTUP") == "1"  # Print launch-to-first-paint and exit
+STARTUP_TIMING = os.environ.get("AICHAT_STARTUP_TIMING") == "1"    # Print how long each startup phase took
+PAGE_READY_TIMEOUT_MS = 20000  # Give up on the chat page (and stop queueing prompts) after this long
+
+# Connection pool shared by every request made by the app
+HTTP2_ENABLED = True          # Used only when the optional "h2" package is installed
+POOL_MAX_CONNECTIONS = 10
+POOL_MAX_KEEPALIVE = 5
+POOL_KEEPALIVE_EXPIRY = 120.0 # Seconds an idle connection is kept open
+CONNECT_TIMEOUT = 10.0
+READ_TIMEOUT = 60.0           # Max gap between bytes of a streamed response
+
+# Context packing: each request is filled with the newest turns that fit the
+# model's context window, leaving room for the reply
+DEFAULT_CONTEXT_TOKENS = 32000
+MODEL_CONTEXT_TOKENS = {}     # Per model id overrides, e.g. {"openrouter/free": 128000}
+RESPONSE_RESERVE_TOKENS = 4096
+SUMMARIZE_OLD_TURNS = False   # Fold turns that no longer fit into a background-generated summary
+RETRIEVAL_ENABLED = True      # Recall earlier chunks relevant to the new message when turns were left out
+RETRIEVAL_TOP_K = 6
+RETRIEVAL_BUDGET_TOKENS = 2000
+
+# Local response cache (opt-in from the header's "Cache" toggle)
+RESPONSE_CACHE_ENABLED = False
+RESPONSE_CACHE_MAX_BYTES = 50 * 1024 * 1024
+RESPONSE_CACHE_TTL = 7 * 24 * 3600
+CACHE_REPLAY_TOKENS_PER_SEC = 200  # 0 shows a cached answer all at once
+
+# Failover: free models often answer 429/5xx or stall before the first token.
+# A failing request is retried, then handed to the next fastest model.
+MAX_RETRIES = 2               # Per model, with jittered exponential backoff
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+STALL_TIMEOUT = 30.0          # Seconds without a first token before a request counts as failed
+HEDGE_AFTER = 8.0             # Seconds before the next model is raced alongside; None disables
+FAILOVER_MODELS = 3           # Fallback models tried after the selected one
+
+# Rate limits: a token bucket per key and model, corrected by OpenRouter's
+# X-RateLimit-* and Retry-After headers, holds requests back before they are rejected
+RATE_LIMIT_PER_MINUTE = 20    # Free-model limit until the headers say otherwise
+REROUTE_AFTER = 5.0           # Seconds of expected wait before trying a fallback instead
+
+# Warm-up while typing: a pause in typing reconnects an idle pool with a free
+# request and encodes the history ahead of the send
+WARMUP_ENABLED = True
+WARMUP_DEBOUNCE_MS = 400
+WARMUP_IDLE = 20.0            # Seconds without requests before the connection is warmed again
+
+# Model catalog: the picker is filled from a disk cache of /models at startup,
+# revalidated in the background and ordered by probed time-to-first-token
+CATALOG_REFRESH_DELAY_MS = 2000  # Wait for the window to settle before touching the network
+PROBE_MAX_MODELS = 12            # Free models probed per launch
+PROBE_CONCURRENCY = 4
+PROBE_TIMEOUT = 20.0
+PROBE_INTERVAL = 6 * 3600        # Seconds before a model's latency is measured again
+
 MODELS = {
     "OpenRouter: Auto (Free)": "openrouter/free",
     "Aurora Alpha": "openrouter/aurora-alpha",
@@ -19,71 +92,181 @@ MODELS = {
     "Arcee AI: Trinity Large Preview": "arcee-ai/trinity-large-preview:free"
 }
 
+# --- HTTP ---
+
+def create_http_client():
+    return create_client(API_BASE_URL, HTTP2_ENABLED, POOL_MAX_CONNECTIONS, POOL_MAX_KEEPALIVE,
+                         POOL_KEEPALIVE_EXPIRY, CONNECT_TIMEOUT, READ_TIMEOUT)
+
+# --- Startup ---
+
+startup_phases = []  # (phase, seconds since launch)
+
+def mark_startup(phase):
+    startup_phases.append((phase, time.perf_counter() - STARTUP_T0))
+
+# --- Web ---
+
+def create_web_profile():
+    # Persistent profile so CDN fallbacks stay in the disk cache across launches.
+    # Parented to the application so it outlives the pages that use it.
+    from PySide6.QtWebEngineCore import QWebEngineProfile
+    profile = QWebEngineProfile("aichat", QApplication.instance())
+    profile.setPersistentStoragePath(os.path.join(DATA_DIR, "webengine"))
+    profile.setCachePath(os.path.join(DATA_DIR, "webengine-cache"))
+    profile.setHttpCacheType(QWebEngineProfile.DiskHttpCache)
+    profile.setHttpCacheMaximumSize(WEB_CACHE_MAX_BYTES)
+    return profile
+
 # --- Workers ---
 
-class APIWorker(QThread):
-    token_received = Signal(str)
-    finished_response = Signal()
-    error_occurred = Signal(str)
+class EngineSignals(QObject):
+    # Listener passed to StreamEngine. Its callbacks run on the engine thread;
+    # emitting Qt signals hands them over to the GUI thread.
+    token_received = Signal(str, str)
+    finished_response = Signal(str)
+    error_occurred = Signal(str, str)
 
-    def __init__(self, api_key, model, messages):
-        super().__init__()
-        self.api_key = api_key
-        self.model = model
-        self.messages = messages
-
-    def run(self):
-        url = "https://openrouter.ai/api/v1/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "HTTP-Referer": "http://localhost",
-            "X-Title": "AI Chat Python",
-            "Content-Type": "application/json"
-        }
-        data = {
-            "model": self.model,
-            "messages": self.messages,
-            "stream": True,
-            "max_tokens": 4096
-        }
+    def on_token(self, handle, token):
+        self.token_received.emit(handle.id, token)
 
-        try:
-            with httpx.stream("POST", url, headers=headers, json=data, timeout=60.0) as response:
-                if response.status_code != 200:
-                    self.error_occurred.emit(f"Error: {response.status_code} - {response.read().decode()}")
-                    return
-
-                for line in response.iter_lines():
-                    if not line:
-                        continue
-                    if line.startswith("data: "):
-                        data_str = line[6:].strip()
-                        if data_str == "[DONE]":
-                            break
-                        try:
-                            json_data = json.loads(data_str)
-                            choices = json_data.get("choices", [])
-                            if choices:
-                                delta = choices[0].get("delta", {})
-                                content = delta.get("content", "")
-                                if content:
-                                    self.token_received.emit(content)
-                        except json.JSONDecodeError:
-                            continue
-        except Exception as e:
-            self.error_occurred.emit(f"Connection Error: {str(e)}")
-        finally:
-            self.finished_response.emit()
+    def on_finished(self, handle):
+        self.finished_response.emit(handle.id)
+
+    def on_error(self, handle, message):
+        self.error_occurred.emit(handle.id, message)
+
+# --- Dialogs ---
+
+class HistoryDialog(QDialog):
+    # Recent conversations, or full-text search results while typing
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.selected_conversation = None
+        self.setWindowTitle("Chat History")
+        self.resize(560, 480)
+
+        layout = QVBoxLayout(self)
+        self.search_box = QLineEdit()
+        self.search_box.setPlaceholderText("Search all chats...")
+        layout.addWidget(self.search_box)
+        self.results = QListWidget()
+        self.results.itemActivated.connect(self.open_item)
+        layout.addWidget(self.results)
+
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self.refresh)
+        self.search_box.textChanged.connect(self.search_timer.start)
+        self.refresh()
+
+    def refresh(self):
+        self.results.clear()
+        text = self.search_box.text().strip()
+        if text:
+            rows = [(r["conversation_id"], f"{r['title']}\n    {r['snippet']}") for r in self.store.search(text)]
+        else:
+            rows = [(r["id"], r["title"]) for r in self.store.list_conversations()]
+        for conversation_id, label in rows:
+            item = QListWidgetItem(label)
+            item.setData(Qt.UserRole, conversation_id)
+            self.results.addItem(item)
+
+    def open_item(self, item):
+        self.selected_conversation = item.data(Qt.UserRole)
+        self.accept()
+
+class StatsDialog(QDialog):
+    # Per-model streaming performance collected by Telemetry
+    COLUMNS = ["Model", "Requests", "Errors", "TTFB p50", "TTFT p50", "TTFT p95",
+               "Gap p50", "Gap p95", "Tokens/s", "Prompt tok", "Completion tok"]
+
+    def __init__(self, telemetry, parent=None):
+        super().__init__(parent)
+        self.telemetry = telemetry
+        self.setWindowTitle("Model Stats")
+        self.resize(980, 360)
+
+        layout = QVBoxLayout(self)
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        buttons = QHBoxLayout()
+        for label, slot in (("Export Prometheus...", self.export_prometheus),
+                            ("Export JSONL...", self.export_jsonl), ("Reset", self.reset)):
+            button = QPushButton(label)
+            button.clicked.connect(slot)
+            buttons.addWidget(button)
+        buttons.addStretch()
+        layout.addLayout(buttons)
+        self.refresh()
+
+    def refresh(self):
+        rows = self.telemetry.summary()
+        self.table.setRowCount(len(rows))
+        for row_index, row in enumerate(rows):
+            values = [
+                row["model"], row["requests"], row["errors"],
+                seconds(row["ttfb_seconds"]["p50"]),
+                seconds(row["ttft_seconds"]["p50"]), seconds(row["ttft_seconds"]["p95"]),
+                seconds(row["inter_token_seconds"]["p50"]), seconds(row["inter_token_seconds"]["p95"]),
+                "-" if row["tokens_per_second"]["mean"] is None else f"{row['tokens_per_second']['mean']:.0f}",
+                row["prompt_tokens"], row["completion_tokens"],
+            ]
+            for column, value in enumerate(values):
+                self.table.setItem(row_index, column, QTableWidgetItem(str(value)))
+
+    def export_prometheus(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Prometheus Metrics", "aichat.prom", "Prometheus (*.prom *.txt)")
+        if path:
+            self.telemetry.export_prometheus(path)
+
+    def export_jsonl(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export JSONL", "aichat-stats.jsonl", "JSON Lines (*.jsonl)")
+        if path:
+            self.telemetry.export_jsonl(path)
+
+    def reset(self):
+        self.telemetry.reset()
+        self.refresh()
+
+
+def seconds(value):
+    if value is None:
+        return "-"
+    return f"{value * 1000:.0f} ms" if value < 1 else f"{value:.2f} s"
 
 # --- Main Window ---
 
 class AIChatApp(QMainWindow):
+    summary_ready = Signal(object, int, object)  # future from StreamEngine.complete, summary_upto, its packer
+    catalog_ready = Signal(object)       # future from refresh_catalog
+    older_indexed = Signal(object, object)  # future from index_older, the packer it was built for
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("AI Chat - OpenRouter (Python)")
         self.resize(1000, 700)
         self.setMinimumSize(700, 500)
-        
+
+        # The native shell is built and shown first; QtWebEngine is imported and
+        # the chat page loaded once the event loop runs (see setup_web_page)
+        os.makedirs(DATA_DIR, exist_ok=True)
+        self.page_ready = False
+        self.page_failed = False
+        self.bridge = ChatBridge(self)
+        self.bridge.pageReady.connect(self.handle_page_ready)
+        self.bridge.firstPaint.connect(self.handle_first_paint)
+        self.bridge.copyRequested.connect(self.copy_to_clipboard)
+        self.bridge.scrollChanged.connect(self.handle_scroll_changed)
+        self.bridge.itemsRequested.connect(self.send_transcript_items)
+
         # Styles handling
         self.setStyleSheet("""
             QMainWindow { background-color: #0F172A; }
@@ -115,6 +298,7 @@ class AIChatApp(QMainWindow):
             }
             QPushButton:hover { background-color: #475569; border-color: #94A3B8; }
             QPushButton:pressed { background-color: #1E293B; }
+            QPushButton:checked { background-color: #2563EB; border-color: #3B82F6; }
             
             /* Send Button */
             QPushButton#SendButton {
@@ -163,14 +347,81 @@ class AIChatApp(QMainWindow):
         """)
 
         self.messages = []
+        self.store = ConversationStore(os.path.join(DATA_DIR, "history.db"))
+        self.conversation_id = None   # created with the first message of a chat
+        self.oldest_loaded_id = None  # paging cursor of a reopened conversation
+        self.transcript = TranscriptModel()
+        # Context windows from the catalog, with MODEL_CONTEXT_TOKENS taking precedence
+        self.catalog = ModelCatalog(os.path.join(DATA_DIR, "models.json"))
+        self.catalog.load()
+        self.context_limits = {}
+        self.apply_catalog()
+        self.catalog_ready.connect(self.handle_catalog_ready)
+        self.create_packer()
+        self.older_indexed.connect(self.handle_older_indexed)
+        self.summary_job = None
+        self.summary_model = None
+        self.summary_first_kept = 0
+        self.summary_ready.connect(self.handle_summary_ready)
         self.current_font_size = 14
+        self.streams = {}        # stream id -> StreamHandle of the current turn
+        self.responses = {}      # stream id -> text received so far
+        self.stream_items = {}   # stream id -> its transcript item (or compare column)
+        self.token_buffers = {}  # stream id -> tokens not yet sent to the page
+        self.reply_recorded = False
+        self.partial_reply = None    # (model, text) of a stopped answer, kept if nothing completes
+        self.pending_messages = []   # prompts sent while a reply is streaming
+        self.chat_at_bottom = True
+
+        # Tokens arrive much faster than the WebView can paint, so they are
+        # collected here and sent over in one batch per frame.
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(TOKEN_FLUSH_INTERVAL_MS)
+        self.flush_timer.timeout.connect(self.flush_tokens)
+        self.warmup_timer = QTimer(self)
+        self.warmup_timer.setSingleShot(True)
+        self.warmup_timer.setInterval(WARMUP_DEBOUNCE_MS)
+        self.warmup_timer.timeout.connect(self.warm_up)
+        # Counts the quota wait down while the model is rate limited
+        self.quota_timer = QTimer(self)
+        self.quota_timer.setInterval(1000)
+        self.quota_timer.timeout.connect(self.update_quota_label)
         self.api_key = self.load_api_key()
+        # One long-lived client so later turns reuse the open connection
+        # instead of paying DNS, TCP and TLS setup again. It lives on the
+        # engine's event loop, which runs every request concurrently.
+        self.engine = StreamEngine(create_http_client())
+        self.engine.cache = ResponseCache(os.path.join(DATA_DIR, "response_cache"),
+                                          RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_TTL)
+        self.engine.cache_enabled = RESPONSE_CACHE_ENABLED
+        self.engine.replay_tokens_per_sec = CACHE_REPLAY_TOKENS_PER_SEC
+        self.engine.max_retries = MAX_RETRIES
+        self.engine.backoff_base = BACKOFF_BASE
+        self.engine.backoff_max = BACKOFF_MAX
+        self.engine.stall_timeout = STALL_TIMEOUT
+        self.engine.hedge_after = HEDGE_AFTER
+        self.engine.rate_limiter = RateLimiter(RATE_LIMIT_PER_MINUTE)
+        self.engine.reroute_after = REROUTE_AFTER
+        self.engine.warmup_idle = WARMUP_IDLE
+        self.telemetry = Telemetry(os.path.join(DATA_DIR, "telemetry.json"))
+        self.telemetry.load()
+        self.engine.telemetry = self.telemetry
+        self.engine.start()
+        self.engine_signals = EngineSignals()
+        self.engine_signals.token_received.connect(self.handle_token)
+        self.engine_signals.finished_response.connect(self.handle_finished)
+        self.engine_signals.error_occurred.connect(self.handle_error)
 
         self.setup_ui()
-        
-        if not self.api_key:
+        QTimer.singleShot(0, self.setup_web_page)
+        mark_startup("window built")
+
+        if not self.api_key and not MEASURE_STARTUP:
             QMessageBox.warning(self, "Missing API Key", 
                 "APIKEY.txt not found.\nPlease create it in the app directory.")
+        if not MEASURE_STARTUP:
+            QTimer.singleShot(CATALOG_REFRESH_DELAY_MS, self.refresh_catalog)
 
     def load_api_key(self):
         try:
@@ -185,6 +436,87 @@ class AIChatApp(QMainWindow):
             pass
         return ""
 
+    def setup_web_page(self):
+        # Runs from the event loop after the shell is on screen. QtWebEngine is
+        # the slowest import of the app, so it is not loaded before this point.
+        mark_startup("shell shown")
+        try:
+            from PySide6.QtWebChannel import QWebChannel
+            from PySide6.QtWebEngineCore import QWebEnginePage, QWebEngineSettings
+            from PySide6.QtWebEngineWidgets import QWebEngineView
+        except ImportError as e:
+            self.handle_page_failed(f"QtWebEngine is not available ({e})")
+            return
+        mark_startup("webengine imported")
+        QTimer.singleShot(PAGE_READY_TIMEOUT_MS, self.check_page_ready)
+
+        self.web_profile = create_web_profile()
+        self.web_page = QWebEnginePage(self.web_profile, self)
+        # Vendored assets are local files; the CDN fallbacks are remote
+        self.web_page.settings().setAttribute(QWebEngineSettings.LocalContentCanAccessRemoteUrls, True)
+        # The page is a file:// document showing untrusted model output; it
+        # must not be able to read APIKEY.txt or the history database
+        self.web_page.settings().setAttribute(QWebEngineSettings.LocalContentCanAccessFileUrls, False)
+        self.channel = QWebChannel(self.web_page)
+        self.channel.registerObject("bridge", self.bridge)
+        self.web_page.setWebChannel(self.channel)
+        self.web_page.loadFinished.connect(self.handle_page_loaded)
+        try:
+            self.web_page.load(QUrl.fromLocalFile(assets.write_chat_page()))
+        except OSError as e:
+            # Read-only install: the page is served from memory with the same
+            # base URL. Without its worker script, big code blocks are
+            # highlighted on the page's main thread.
+            print(f"Could not write the chat page: {e}", file=sys.stderr)
+            self.web_page.setHtml(assets.get_html_content(), QUrl.fromLocalFile(assets.WEB_DIR + os.sep))
+
+        # Kept behind the placeholder until the page has loaded
+        self.webview = QWebEngineView()
+        self.webview.setPage(self.web_page)
+        self.chat_stack.addWidget(self.webview)
+        mark_startup("page created")
+
+    @Slot(bool)
+    def handle_page_loaded(self, ok):
+        if not ok:
+            self.handle_page_failed("the page failed to load")
+
+    def check_page_ready(self):
+        if not self.page_ready:
+            self.handle_page_failed(f"no response after {PAGE_READY_TIMEOUT_MS // 1000} seconds")
+
+    def handle_page_failed(self, reason):
+        # Prompts queued for the page go back to the input box instead of
+        # waiting for a page that is not coming
+        if self.page_ready or self.page_failed:
+            return
+        self.page_failed = True
+        self.loading_label.setText(f"The chat page could not be loaded: {reason}.\nRestart the app to try again.")
+        self.loading_label.setStyleSheet("color: #F87171;")
+        if self.pending_messages:
+            queued = "\n\n".join(self.pending_messages)
+            current = self.input_text.toPlainText().strip()
+            self.input_text.setPlainText(f"{queued}\n\n{current}" if current else queued)
+            self.clear_queue()
+        self.check_input()
+
+    @Slot()
+    def handle_page_ready(self):
+        if not self.page_ready:
+            mark_startup("page ready")
+        self.page_ready = True
+        self.page_failed = False  # slower than the timeout, but it got there
+        self.chat_stack.setCurrentWidget(self.webview)
+        self.update_font_size()
+        if len(self.transcript):
+            # A chat opened from History before the page was up
+            self.bridge.transcriptReset.emit(len(self.transcript))
+        # Prompts sent while the page was loading
+        if self.pending_messages and not self.streams:
+            self.start_turn(self.pending_messages.pop(0))
+            self.update_queue_label()
+        self.check_input()
+
     def setup_ui(self):
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
@@ -205,6 +537,18 @@ class AIChatApp(QMainWindow):
         
         header_layout.addStretch()
 
+        # Conversations
+        self.btn_new_chat = QPushButton("New Chat")
+        self.btn_new_chat.clicked.connect(self.new_chat)
+        self.btn_history = QPushButton("History")
+        self.btn_history.clicked.connect(self.open_history)
+        self.btn_stats = QPushButton("Stats")
+        self.btn_stats.clicked.connect(self.open_stats)
+        header_layout.addWidget(self.btn_new_chat)
+        header_layout.addWidget(self.btn_history)
+        header_layout.addWidget(self.btn_stats)
+        header_layout.addSpacing(10)
+
         # Font Controls
         self.btn_font_dec = QPushButton("A-")
         self.btn_font_dec.setFixedWidth(40)
@@ -221,16 +565,50 @@ class AIChatApp(QMainWindow):
         # Model Selector
         header_layout.addWidget(QLabel("Model:"))
         self.combo_model = QComboBox()
-        self.combo_model.addItems(MODELS.keys())
         self.combo_model.setFixedWidth(250)
+        self.populate_model_combo()
+        self.combo_model.currentIndexChanged.connect(self.update_quota_label)
         header_layout.addWidget(self.combo_model)
+        self.quota_label = QLabel()
+        self.quota_label.setToolTip("Requests left for this model before the rate limit")
+        header_layout.addWidget(self.quota_label)
+        self.update_quota_label()
+
+        # Compare: send the same prompt to several models side by side
+        self.btn_compare = QToolButton()
+        self.btn_compare.setText("Compare")
+        self.btn_compare.setPopupMode(QToolButton.InstantPopup)
+        compare_menu = QMenu(self.btn_compare)
+        self.compare_actions = {}
+        for name in MODELS:
+            action = compare_menu.addAction(name)
+            action.setCheckable(True)
+            action.toggled.connect(self.update_compare_label)
+            self.compare_actions[name] = action
+        compare_menu.addSeparator()
+        self.action_stop_others = compare_menu.addAction("Stop others when one finishes")
+        self.action_stop_others.setCheckable(True)
+        self.btn_compare.setMenu(compare_menu)
+        header_layout.addWidget(self.btn_compare)
+
+        # Cache: replay identical requests from disk instead of the API
+        self.btn_cache = QPushButton("Cache")
+        self.btn_cache.setCheckable(True)
+        self.btn_cache.setChecked(RESPONSE_CACHE_ENABLED)
+        self.btn_cache.setToolTip("Answer repeated prompts from the local response cache")
+        self.btn_cache.toggled.connect(self.toggle_cache)
+        header_layout.addWidget(self.btn_cache)
 
         main_layout.addWidget(header)
 
         # 2. WebView (Chat Area)
-        self.webview = QWebEngineView()
-        self.webview.setHtml(assets.get_html_content())
-        main_layout.addWidget(self.webview)
+        self.chat_stack = QStackedWidget()
+        self.loading_label = QLabel("Loading chat...")
+        self.loading_label.setAlignment(Qt.AlignCenter)
+        self.loading_label.setWordWrap(True)
+        self.loading_label.setStyleSheet("color: #94A3B8;")
+        self.chat_stack.addWidget(self.loading_label)
+        main_layout.addWidget(self.chat_stack)
 
         # 3. Input Area
         input_area = QFrame()
@@ -250,21 +628,146 @@ class AIChatApp(QMainWindow):
         self.btn_send.clicked.connect(self.send_message)
         input_layout.addWidget(self.btn_send)
 
+        self.queue_label = QLabel()
+        self.queue_label.setVisible(False)
+        input_layout.addWidget(self.queue_label)
+
+        # Stop: stops every running stream, the menu stops a single model
+        self.btn_stop = QToolButton()
+        self.btn_stop.setText("Stop")
+        self.btn_stop.setPopupMode(QToolButton.MenuButtonPopup)
+        self.btn_stop.setMenu(QMenu(self.btn_stop))
+        self.btn_stop.menu().aboutToShow.connect(self.populate_stop_menu)
+        self.btn_stop.clicked.connect(self.stop_all_streams)
+        self.btn_stop.setVisible(False)
+        input_layout.addWidget(self.btn_stop)
+
         main_layout.addWidget(input_area)
 
-        # Initialize Font in WebView
-        # We need to wait for load? usually it's fast enough or we can inject later
-        self.webview.loadFinished.connect(lambda: self.update_font_size())
+    # --- Model Catalog ---
+
+    def apply_catalog(self):
+        self.model_names = {m["id"]: m["name"] for m in self.catalog.free_models()}
+        self.model_names.update((model_id, name) for name, model_id in MODELS.items())
+        self.context_limits.clear()
+        self.context_limits.update(self.catalog.context_lengths())
+        self.context_limits.update(MODEL_CONTEXT_TOKENS)
+
+    def catalog_model_ids(self):
+        # Built-in models first, then the free models from the catalog
+        return list(dict.fromkeys([*MODELS.values(), *(m["id"] for m in self.catalog.free_models())]))
+
+    def populate_model_combo(self):
+        current = self.combo_model.currentData()
+        self.combo_model.clear()
+        for model_id in self.catalog.rank(self.catalog_model_ids()):
+            label = self.model_names.get(model_id, model_id)
+            probe = self.catalog.probes.get(model_id)
+            if probe and probe.get("ok"):
+                label += f"  ({probe['ttft']:.1f}s)"
+            elif probe:
+                label += "  (unavailable)"
+            self.combo_model.addItem(label, model_id)
+            if probe and probe.get("error"):
+                self.combo_model.setItemData(self.combo_model.count() - 1, probe["error"], Qt.ToolTipRole)
+        index = self.combo_model.findData(current)
+        self.combo_model.setCurrentIndex(max(index, 0))
+
+    def refresh_catalog(self):
+        job = self.engine.submit(self.update_catalog())
+        job.add_done_callback(self.catalog_ready.emit)
+
+    async def update_catalog(self):
+        # Runs on the engine loop: revalidate the model list, then probe the
+        # models whose latency is unknown or out of date
+        await self.catalog.refresh(self.engine.client, self.api_key)
+        if self.api_key:
+            candidates = self.catalog.probe_candidates(self.catalog_model_ids(), PROBE_INTERVAL, PROBE_MAX_MODELS)
+            if candidates:
+                await self.catalog.probe(self.engine.client, self.api_key, candidates,
+                                         PROBE_CONCURRENCY, PROBE_TIMEOUT, self.engine.rate_limiter)
+
+    @Slot(object)
+    def handle_catalog_ready(self, future):
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            print(f"Model catalog refresh failed: {future.exception()}", file=sys.stderr)
+        self.apply_catalog()
+        self.populate_model_combo()
+        self.update_quota_label()
 
     def check_input(self):
-        self.btn_send.setEnabled(bool(self.input_text.toPlainText().strip()))
+        # While a reply streams, Send queues the prompt for the next turn
+        has_text = bool(self.input_text.toPlainText().strip())
+        self.btn_send.setEnabled(has_text and not self.page_failed)
+        self.btn_send.setText("Queue" if self.streams or not self.page_ready else "Send")
+        if WARMUP_ENABLED and has_text and self.api_key:
+            self.warmup_timer.start()
+
+    def warm_up(self):
+        # The engine ignores this while requests are running or were made recently
+        if self.streams or not self.input_text.toPlainText().strip():
+            return
+        self.engine.warm_up(self.api_key)
+        context_messages, _ = self.packer.pack(self.messages, self.combo_model.currentData())
+        self.engine.pre_encode(context_messages)
+
+    def update_quota_label(self):
+        model_id = self.combo_model.currentData()
+        if not self.api_key or model_id is None:
+            self.quota_label.clear()
+            self.quota_timer.stop()
+            return
+        remaining, limit, wait = self.engine.rate_limiter.quota(self.api_key, model_id)
+        text = f"{remaining}/{limit}"
+        if wait >= 1:
+            text += f" ({wait:.0f}s)"
+        self.quota_label.setText(text)
+        if wait > 0:
+            self.quota_timer.start()
+        else:
+            self.quota_timer.stop()
+
+    def update_queue_label(self):
+        count = len(self.pending_messages)
+        self.queue_label.setText(f"{count} queued")
+        self.queue_label.setVisible(count > 0)
+
+    def clear_queue(self):
+        self.pending_messages.clear()
+        self.update_queue_label()
+
+    def update_compare_label(self):
+        count = len(self.selected_compare_models())
+        self.btn_compare.setText(f"Compare ({count})" if count > 1 else "Compare")
+
+    def selected_compare_models(self):
+        return [name for name, action in self.compare_actions.items() if action.isChecked()]
+
+    def populate_stop_menu(self):
+        menu = self.btn_stop.menu()
+        menu.clear()
+        for stream_id, handle in self.streams.items():
+            name = self.model_names.get(handle.model, handle.model)
+            menu.addAction(f"Stop {name}", lambda h=handle: h.cancel())
+        if self.pending_messages:
+            menu.addSeparator()
+            menu.addAction(f"Clear queue ({len(self.pending_messages)})", self.clear_queue)
+
+    def toggle_cache(self, enabled):
+        self.engine.cache_enabled = enabled
+
+    def stop_all_streams(self):
+        for handle in self.streams.values():
+            handle.cancel()
 
     def update_font_size(self):
         # Update Native UI Font
         font = QFont("Segoe UI", self.current_font_size)
         QApplication.setFont(font)
         # Update Web UI Font
-        self.webview.page().runJavaScript(f"updateFontSize({self.current_font_size})")
+        self.bridge.settingsChanged.emit({"fontSize": self.current_font_size})
 
     def decrease_font(self):
         if self.current_font_size > 10:
@@ -278,53 +781,324 @@ class AIChatApp(QMainWindow):
 
     def send_message(self):
         user_text = self.input_text.toPlainText().strip()
-        if not user_text or not self.api_key:
+        if not user_text or not self.api_key or self.page_failed:
             return
 
         self.input_text.clear()
-        self.btn_send.setEnabled(False)
-        
+        if self.streams or not self.page_ready:
+            # One turn at a time: the prompt is sent once the current reply ends
+            # (or, right after launch, once the chat page has loaded)
+            self.pending_messages.append(user_text)
+            self.update_queue_label()
+            return
+        self.start_turn(user_text)
+
+    def start_turn(self, user_text, follow=True):
+        # follow: scroll the chat to the new turn even if the user scrolled up
+        if follow:
+            self.chat_at_bottom = True  # the page pins itself to the bottom again
         # 1. Show user message
-        escaped_text = json.dumps(user_text)
-        self.webview.page().runJavaScript(f"appendUserMessage({escaped_text})")
+        item = {"role": "user", "content": user_text}
+        self.bridge.itemsAppended.emit(self.transcript.append(item), [item], follow)
         
-        self.messages.append({"role": "user", "content": user_text})
+        message = {"role": "user", "content": user_text}
+        message_tokens(message)
+        self.messages.append(message)
+        self.index_message(len(self.messages) - 1, message)
+        if self.conversation_id is None:
+            self.conversation_id = self.store.new_conversation(user_text[:80])
+        self.store.append_message(self.conversation_id, "user", user_text, tokens=message["tokens"])
 
-        # 2. Start AI Stream
-        model_id = MODELS[self.combo_model.currentText()]
-        context_messages = self.messages[-MAX_CONTEXT_MESSAGES:]
-        
-        # Prepare UI for AI response
-        self.webview.page().runJavaScript("startAIMessage()")
-
-        self.worker = APIWorker(self.api_key, model_id, context_messages)
-        self.worker.token_received.connect(self.handle_token)
-        self.worker.finished_response.connect(self.handle_finished)
-        self.worker.error_occurred.connect(self.handle_error)
-        self.worker.start()
-        
-        self.current_response = ""
+        # 2. Start AI Stream(s), with the context packed for each model
+        model_ids = [MODELS[name] for name in self.selected_compare_models()]
+        if len(model_ids) < 2:
+            model_ids = [self.combo_model.currentData()]
+        requests = []
+        for model_id in reversed(model_ids):
+            context_messages, first_kept = self.packer.pack(self.messages, model_id)
+            requests.insert(0, (model_id, context_messages))
+        # The summary covers the turns dropped for the first (primary) model
+        self.summary_model = model_ids[0]
+        self.summary_first_kept = first_kept
+
+        if len(requests) > 1:
+            handles = self.engine.fan_out(
+                self.api_key, requests, self.engine_signals,
+                stop_others_on_finish=self.action_stop_others.isChecked()).handles
+        else:
+            # A single model fails over along the built-in models, fastest first
+            fallbacks = [(model_id, self.packer.pack(self.messages, model_id)[0])
+                         for model_id in self.catalog.rank(MODELS.values())
+                         if model_id != model_ids[0]][:FAILOVER_MODELS]
+            handles = [self.engine.stream_chat(self.api_key, *requests[0], self.engine_signals,
+                                               fallbacks=fallbacks)]
+
+        self.reply_recorded = False
+        self.partial_reply = None
+        for handle in handles:
+            self.streams[handle.id] = handle
+            self.responses[handle.id] = ""
+
+        # Prepare UI for AI response, one column per model when comparing
+        if len(handles) > 1:
+            columns = []
+            for handle in handles:
+                column = {"streamId": handle.id, "label": self.model_names.get(handle.model, handle.model), "content": ""}
+                self.stream_items[handle.id] = column
+                columns.append(column)
+            item = {"role": "compare", "columns": columns}
+        else:
+            item = {"role": "ai", "streamId": handles[0].id, "label": "", "content": ""}
+            self.stream_items[handles[0].id] = item
+        self.bridge.itemsAppended.emit(self.transcript.append(item), [item], follow)
+        self.btn_stop.setVisible(True)
+        self.check_input()
+        self.update_quota_label()
+
+    @Slot(str, str)
+    def handle_token(self, stream_id, token):
+        if stream_id not in self.streams:
+            return
+        self.responses[stream_id] += token
+        self.token_buffers.setdefault(stream_id, []).append(token)
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    def flush_tokens(self):
+        self.flush_timer.stop()
+        buffers = self.token_buffers
+        self.token_buffers = {}
+        for stream_id, tokens in buffers.items():
+            self.bridge.tokensReceived.emit(stream_id, tokens)
+
+    @Slot(str)
+    def handle_finished(self, stream_id):
+        handle = self.streams.pop(stream_id, None)
+        if handle is None:
+            return
+        self.flush_tokens()
+        # Stopped answers and answers cut off by max_tokens are kept, marked truncated
+        truncated = (handle.cancelled and not handle.succeeded) or handle.finish_reason == "length"
+        if handle.cancelled and not handle.succeeded:
+            note = "Stopped"
+        elif handle.finish_reason == "length":
+            note = "Cut off at the length limit"
+        elif handle.cached:
+            note = "Answered from cache"
+        elif handle.model != handle.requested_model:
+            note = f"Answered by {self.model_names.get(handle.model, handle.model)}"
+        else:
+            note = ""
+        self.bridge.messageFinished.emit(stream_id, note)
+
+        # When comparing, the first complete answer becomes part of the history
+        response = self.responses.pop(stream_id)
+        item = self.stream_items.pop(stream_id)
+        del item["streamId"]
+        item["content"] = response
+        item["note"] = note
+        self.update_quota_label()
+        if handle.succeeded and not self.reply_recorded:
+            self.record_reply(handle.model, response, truncated)
+        elif truncated and response and self.partial_reply is None:
+            self.partial_reply = (handle.model, response)
+
+        if not self.streams:
+            # A stopped answer goes into the history only if no other one completed
+            if not self.reply_recorded and self.partial_reply is not None:
+                self.record_reply(*self.partial_reply, truncated=True)
+            self.partial_reply = None
+            self.btn_stop.setVisible(False)
+            self.check_input()
+            self.input_text.setFocus()
+            self.update_summary()
+            if self.pending_messages:
+                # A queued prompt only scrolls the chat if it was already at the bottom
+                self.start_turn(self.pending_messages.pop(0), follow=self.chat_at_bottom)
+                self.update_queue_label()
+
+    def record_reply(self, model, response, truncated):
+        message = {"role": "assistant", "content": response, "model": model, "truncated": truncated}
+        message_tokens(message)
+        self.messages.append(message)
+        self.index_message(len(self.messages) - 1, message)
+        self.store.append_message(self.conversation_id, "assistant", response,
+                                  model=model, tokens=message["tokens"], truncated=truncated)
+        self.reply_recorded = True
+
+    def create_packer(self):
+        self.packer = ContextPacker(self.context_limits, DEFAULT_CONTEXT_TOKENS, RESPONSE_RESERVE_TOKENS)
+        if RETRIEVAL_ENABLED:
+            self.packer.retrieval = RetrievalIndex()
+            self.packer.recall_k = RETRIEVAL_TOP_K
+            self.packer.recall_tokens = RETRIEVAL_BUDGET_TOKENS
+
+    def index_message(self, position, message):
+        # Positions are indexes into self.messages
+        if self.packer.retrieval is not None:
+            self.packer.retrieval.add(position, message["role"], message["content"])
+
+    def update_summary(self):
+        # Summarize turns that were dropped from the last request, off the UI thread
+        if not SUMMARIZE_OLD_TURNS or self.summary_job is not None:
+            return
+        request = self.packer.summary_request(self.messages, self.summary_first_kept)
+        if request is None:
+            return
+        prompt, upto = request
+        packer = self.packer
+        self.summary_job = self.engine.complete(self.api_key, self.summary_model, prompt)
+        self.summary_job.add_done_callback(lambda future: self.summary_ready.emit(future, upto, packer))
+
+    @Slot(object, int, object)
+    def handle_summary_ready(self, future, upto, packer):
+        # Ignored if another chat was opened in the meantime
+        if future is self.summary_job:
+            self.summary_job = None
+        if packer is not self.packer or future.cancelled() or future.exception() is not None:
+            return
+        packer.set_summary(future.result().strip(), upto)
+
+    @Slot(str, str)
+    def handle_error(self, stream_id, error_msg):
+        if stream_id not in self.streams:
+            return
+        self.flush_tokens()
+        self.responses[stream_id] += error_msg
+        self.bridge.tokensReceived.emit(stream_id, [error_msg])
+
+    # --- Conversations ---
+
+    def reset_conversation(self):
+        # Late callbacks of the cancelled streams are ignored once they are forgotten here
+        self.stop_all_streams()
+        self.streams.clear()
+        self.responses.clear()
+        self.stream_items.clear()
+        self.token_buffers.clear()
+        self.partial_reply = None
+        self.clear_queue()
+        self.btn_stop.setVisible(False)
+        self.check_input()
+        self.messages = []
+        if self.summary_job is not None:
+            self.summary_job.cancel()
+            self.summary_job = None
+        self.summary_first_kept = 0
+        self.create_packer()
+        self.conversation_id = None
+        self.oldest_loaded_id = None
+        self.transcript.reset()
+        self.chat_at_bottom = True
+        self.bridge.transcriptReset.emit(0)
+
+    def new_chat(self):
+        self.reset_conversation()
+
+    def open_history(self):
+        dialog = HistoryDialog(self.store, self)
+        if dialog.exec() and dialog.selected_conversation:
+            self.load_conversation(dialog.selected_conversation)
+
+    def open_stats(self):
+        StatsDialog(self.telemetry, self).exec()
+
+    def load_conversation(self, conversation_id):
+        # Only the newest page is loaded; older items are fetched as the page scrolls to them
+        self.reset_conversation()
+        self.store.flush()
+        total = self.store.count_messages(conversation_id)
+        page, _ = self.store.load_page(conversation_id)
+        self.conversation_id = conversation_id
+        self.oldest_loaded_id = page[0]["id"] if page else None
+        self.messages = [{"role": m["role"], "content": m["content"], "tokens": m["tokens"],
+                          "truncated": bool(m["truncated"])} for m in page]
+        for position, message in enumerate(self.messages):
+            self.index_message(position, message)
+        if self.packer.retrieval is not None and self.oldest_loaded_id is not None and total > len(page):
+            # Older messages are not loaded into self.messages but can still be
+            # recalled. Indexing a long chat takes a while, so it happens in a
+            # worker thread and the result replaces the index once it is done.
+            job = self.engine.submit(asyncio.to_thread(
+                self.index_older, conversation_id, self.oldest_loaded_id, total - len(page)))
+            packer = self.packer
+            job.add_done_callback(lambda future: self.older_indexed.emit(future, packer))
+        self.transcript.reset([self.history_item(m) for m in page], total - len(page), self.load_older_items)
+        self.bridge.transcriptReset.emit(len(self.transcript))
+
+    def index_older(self, conversation_id, before_id, count):
+        # Worker thread: the count messages before before_id, at negative
+        # positions so they come before everything in self.messages
+        index = RetrievalIndex()
+        for position, row in enumerate(self.store.iter_messages(conversation_id, before_id), -count):
+            index.add(position, row["role"], row["content"])
+        return index
+
+    @Slot(object, object)
+    def handle_older_indexed(self, future, packer):
+        # Ignored if another chat was opened in the meantime
+        if packer is not self.packer or future.cancelled():
+            return
+        if future.exception() is not None:
+            print(f"Indexing older messages failed: {future.exception()}", file=sys.stderr)
+            return
+        index = future.result()
+        index.merge(packer.retrieval)
+        packer.retrieval = index
+
+    def history_item(self, message):
+        if message["role"] == "user":
+            return {"role": "user", "content": message["content"]}
+        return {"role": "ai", "content": message["content"], "label": "",
+                "note": "Truncated" if message["truncated"] else ""}
+
+    def load_older_items(self, count):
+        if self.conversation_id is None or self.oldest_loaded_id is None:
+            return []
+        page, _ = self.store.load_page(self.conversation_id, self.oldest_loaded_id, max(count, PAGE_SIZE))
+        if page:
+            self.oldest_loaded_id = page[0]["id"]
+        return [self.history_item(m) for m in page]
+
+    @Slot(int, int)
+    def send_transcript_items(self, start, end):
+        self.bridge.itemsLoaded.emit(start, self.transcript.get_range(start, end))
 
     @Slot(str)
-    def handle_token(self, token):
-        self.current_response += token
-        escaped_token = json.dumps(token)
-        self.webview.page().runJavaScript(f"appendAIToken({escaped_token})")
+    def copy_to_clipboard(self, text):
+        QApplication.clipboard().setText(text)
+
+    @Slot(bool)
+    def handle_scroll_changed(self, at_bottom):
+        self.chat_at_bottom = at_bottom
 
     @Slot()
-    def handle_finished(self):
-        self.messages.append({"role": "assistant", "content": self.current_response})
-        self.btn_send.setEnabled(True)
-        self.input_text.setFocus()
+    def handle_first_paint(self):
+        mark_startup("first paint")
+        if STARTUP_TIMING or MEASURE_STARTUP:
+            previous = 0.0
+            for phase, elapsed in startup_phases:
+                print(f"phase {elapsed:.3f} {elapsed - previous:+.3f} {phase}", flush=True)
+                previous = elapsed
+        if MEASURE_STARTUP:
+            print(f"first-paint {time.perf_counter() - STARTUP_T0:.3f}", flush=True)
+            QTimer.singleShot(0, self.close)
 
-    @Slot(str)
-    def handle_error(self, error_msg):
-        escaped_error = json.dumps(error_msg)
-        self.webview.page().runJavaScript(f"appendAIToken({escaped_error})")
-        self.btn_send.setEnabled(True)
+    def closeEvent(self, event):
+        self.engine.close()
+        self.store.close()
+        try:
+            self.telemetry.save()
+        except OSError as e:
+            print(f"Could not save telemetry: {e}", file=sys.stderr)
+        super().closeEvent(event)
 
 if __name__ == "__main__":
+    mark_startup("imports")
+    # Required by QtWebEngine when it is imported after the application exists
+    QApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
     app = QApplication(sys.argv)
+    mark_startup("application")
     window = AIChatApp()
     window.show()
     sys.exit(app.exec())
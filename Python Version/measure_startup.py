@@ -0,0 +1,62 @@
+# Measures time from launch to the chat page's first paint, with and without
+# network access, and the median time of each startup phase on the way there.
+# Offline runs point Chromium at a dead proxy, which is what a machine without
+# a connection looks like to the page.
+# Usage: python "Python Version/measure_startup.py" [runs]
+
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+TIMEOUT = 60.0
+OFFLINE_FLAGS = "--proxy-server=127.0.0.1:9 --proxy-bypass-list=<-loopback>"
+
+
+def launch(offline):
+    env = dict(os.environ, AICHAT_MEASURE_STARTUP="1")
+    if offline:
+        env["QTWEBENGINE_CHROMIUM_FLAGS"] = (env.get("QTWEBENGINE_CHROMIUM_FLAGS", "") + " " + OFFLINE_FLAGS).strip()
+    painted = threading.Event()
+    result = []
+    phases = {}
+
+    def read_output(stream):
+        for line in stream:
+            if line.startswith("phase "):
+                # "phase <since launch> <+since previous> <name>"
+                _, _, step, name = line.rstrip("\n").split(" ", 3)
+                phases[name] = float(step)
+            elif line.startswith("first-paint"):
+                result.append(time.perf_counter() - start)
+                painted.set()
+
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, MAIN], env=env, stdout=subprocess.PIPE, text=True)
+    threading.Thread(target=read_output, args=(proc.stdout,), daemon=True).start()
+    painted.wait(TIMEOUT)
+    proc.kill()
+    proc.wait()
+    return (result[0], phases) if result else None
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    for label, offline in (("online", False), ("offline", True)):
+        launches = [r for r in (launch(offline) for _ in range(runs)) if r is not None]
+        times = [t for t, _ in launches]
+        if times:
+            print(f"{label:8} launch to first paint: median {statistics.median(times):.3f}s "
+                  f"(min {min(times):.3f}s, {len(times)}/{runs} runs)")
+            for name in launches[0][1]:
+                steps = [phases[name] for _, phases in launches if name in phases]
+                print(f"{'':8}   {name:20} {statistics.median(steps) * 1000:7.0f} ms")
+        else:
+            print(f"{label:8} page never painted within {TIMEOUT:.0f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+# Local stand-in for the OpenRouter API, for benchmarks and offline testing
+# Serves /api/v1/chat/completions as a chat-completions SSE stream, either
+# synthetic (token count, size and rate are configurable) or replayed from a
+# recorded stream, and can inject 429/5xx errors and stalls. /api/v1/models
+# returns a small static list. Only the standard library is used.
+# Usage: python "Python Version/mock_openrouter.py" [--port 8765] [--rate 200] ...
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from httpserver import HTTPServer
+
+MODELS_RESPONSE = {"data": [
+    {"id": "mock/fast:free", "name": "Mock: Fast", "context_length": 32000,
+     "pricing": {"prompt": "0", "completion": "0"}},
+    {"id": "mock/slow:free", "name": "Mock: Slow", "context_length": 8000,
+     "pricing": {"prompt": "0", "completion": "0"}},
+]}
+
+
+class MockConfig:
+    def __init__(self, tokens=500, token_chars=4, rate=200.0, first_token_delay=0.0,
+                 errors=None, stall_rate=0.0, replay=None, chunk_tokens=1):
+        self.tokens = tokens                        # tokens per synthetic answer
+        self.token_chars = token_chars              # characters per token
+        self.rate = rate                            # tokens per second, 0 for as fast as possible
+        self.first_token_delay = first_token_delay  # seconds before the first token
+        self.errors = errors or {}                  # status -> probability, e.g. {429: 0.1}
+        self.stall_rate = stall_rate                # probability of never sending a token
+        self.replay = replay                        # recorded SSE body (bytes) to send instead
+        self.chunk_tokens = chunk_tokens            # tokens per SSE event
+
+
+def parse_errors(text):
+    # "429:0.1,503:0.05" -> {429: 0.1, 503: 0.05}
+    errors = {}
+    for part in filter(None, (text or "").split(",")):
+        status, probability = part.split(":")
+        errors[int(status)] = float(probability)
+    return errors
+
+
+def synthetic_token(index, chars):
+    word = "lorem ipsum dolor sit amet consectetur adipiscing elit".split()[index % 8]
+    return (" " + word)[:chars].ljust(chars, "x")
+
+
+class MockServer(HTTPServer):
+    def __init__(self, config=None, host="127.0.0.1", port=0, model_configs=None):
+        super().__init__(host, port)
+        self.config = config or MockConfig()
+        self.model_configs = model_configs or {}  # model id -> MockConfig used instead of config
+        self.chat_requests = {}                   # model id -> chat completion requests received
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}/api/v1"
+
+    async def route(self, method, path, headers, body, writer):
+        if method == "GET" and path == "/api/v1/models":
+            etag = '"mock-models-1"'
+            if headers.get("if-none-match") == etag:
+                await self.send(writer, 304, b"", {"ETag": etag})
+            else:
+                await self.send(writer, 200, json.dumps(MODELS_RESPONSE).encode(),
+                                {"Content-Type": "application/json", "ETag": etag})
+        elif method == "POST" and path == "/api/v1/chat/completions":
+            await self.chat_completions(json.loads(body or b"{}"), writer)
+        else:
+            await self.send_error(writer, 404, "not found")
+
+    async def chat_completions(self, request, writer):
+        model = request.get("model", "mock")
+        self.chat_requests[model] = self.chat_requests.get(model, 0) + 1
+        config = self.model_configs.get(model, self.config)
+        roll = random.random()
+        for status, probability in config.errors.items():
+            if roll < probability:
+                await self.send_error(writer, status, "mock error")
+                return
+            roll -= probability
+
+        if not request.get("stream", False):
+            text = "".join(synthetic_token(i, config.token_chars) for i in range(config.tokens))
+            reply = {"model": model,
+                     "choices": [{"index": 0, "message": {"role": "assistant", "content": text}}]}
+            await self.send(writer, 200, json.dumps(reply).encode(), {"Content-Type": "application/json"})
+            return
+
+        await self.start_stream(writer)
+        await self.write_chunk(writer, b": OPENROUTER PROCESSING\n\n")
+        if config.replay is None:
+            # OpenRouter opens with an empty assistant chunk before the first token
+            opening = {"model": model,
+                       "choices": [{"index": 0, "delta": {"role": "assistant", "content": ""}}]}
+            await self.write_chunk(writer, b"data: " + json.dumps(opening).encode() + b"\n\n")
+        if random.random() < config.stall_rate:
+            await asyncio.sleep(3600)
+        if config.first_token_delay:
+            await asyncio.sleep(config.first_token_delay)
+
+        if config.replay is not None:
+            await self.write_chunk(writer, config.replay)
+        else:
+            await self.stream_synthetic(request, writer, config)
+        await self.write_chunk(writer, b"")
+
+    async def stream_synthetic(self, request, writer, config):
+        model = request.get("model", "mock")
+        tokens = min(config.tokens, request.get("max_tokens") or config.tokens)
+        interval = config.chunk_tokens / config.rate if config.rate else 0.0
+        start = time.perf_counter()
+        for index in range(0, tokens, config.chunk_tokens):
+            text = "".join(synthetic_token(i, config.token_chars)
+                           for i in range(index, min(index + config.chunk_tokens, tokens)))
+            event = {"model": model, "choices": [{"index": 0, "delta": {"content": text}}]}
+            await self.write_chunk(writer, b"data: " + json.dumps(event).encode() + b"\n\n")
+            # Pace against the start time so scheduling jitter does not add up
+            delay = start + interval * (index // config.chunk_tokens + 1) - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif interval == 0 and index % 64 == 0:
+                await asyncio.sleep(0)
+        final = {"model": model, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                 "usage": {"prompt_tokens": sum(len(str(m.get("content", ""))) // 4
+                                                for m in request.get("messages", [])),
+                           "completion_tokens": tokens}}
+        await self.write_chunk(writer, b"data: " + json.dumps(final).encode() + b"\n\ndata: [DONE]\n\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the OpenRouter chat API")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--tokens", type=int, default=500)
+    parser.add_argument("--token-chars", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=200.0, help="tokens per second, 0 for unlimited")
+    parser.add_argument("--chunk-tokens", type=int, default=1, help="tokens per SSE event")
+    parser.add_argument("--first-token-delay", type=float, default=0.0)
+    parser.add_argument("--errors", default="", help='e.g. "429:0.1,503:0.05"')
+    parser.add_argument("--stall-rate", type=float, default=0.0)
+    parser.add_argument("--replay", help="file with a recorded SSE response body")
+    args = parser.parse_args()
+
+    replay = None
+    if args.replay:
+        with open(args.replay, "rb") as f:
+            replay = f.read()
+    config = MockConfig(args.tokens, args.token_chars, args.rate, args.first_token_delay,
+                        parse_errors(args.errors), args.stall_rate, replay, args.chunk_tokens)
+
+    async def serve():
+        server = MockServer(config, port=args.port)
+        await server.start()
+        print(f"Mock OpenRouter listening on {server.base_url}")
+        await server.server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# OpenRouter model catalog
+# The model list from /models is cached on disk and revalidated with
+# ETag / If-Modified-Since, so startup never waits for it. Free models are
+# probed concurrently for health and time-to-first-token, and the results are
+# kept in the same cache file to rank the model picker.
+# Network methods are coroutines meant to run on the StreamEngine loop.
+
+import asyncio
+import json
+import os
+import time
+
+from sse import SSEDecoder, iter_deltas
+
+PROBE_PROMPT = [{"role": "user", "content": "Hi"}]
+
+
+def is_free(model):
+    pricing = model.get("pricing") or {}
+    return model["id"].endswith(":free") or (
+        str(pricing.get("prompt", "1")) in ("0", "0.0") and str(pricing.get("completion", "1")) in ("0", "0.0"))
+
+
+class ModelCatalog:
+    def __init__(self, path):
+        self.path = path
+        self.models = []          # [{"id", "name", "context_length", "pricing"}, ...]
+        self.etag = None
+        self.last_modified = None
+        self.fetched = 0.0
+        self.probes = {}          # model id -> {"ok", "ttft", "checked", "error"}
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.models = data.get("models", [])
+        self.etag = data.get("etag")
+        self.last_modified = data.get("last_modified")
+        self.fetched = data.get("fetched", 0.0)
+        self.probes = data.get("probes", {})
+
+    def save(self):
+        data = {"models": self.models, "etag": self.etag, "last_modified": self.last_modified,
+                "fetched": self.fetched, "probes": self.probes}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    # --- Queries ---
+
+    def free_models(self):
+        return [m for m in self.models if is_free(m)]
+
+    def context_lengths(self):
+        return {m["id"]: m["context_length"] for m in self.models if m.get("context_length")}
+
+    def rank(self, model_ids):
+        # Healthy models by latency, then unprobed ones, then failing ones
+        def sort_key(model_id):
+            probe = self.probes.get(model_id)
+            if probe is None:
+                return (1, 0.0)
+            if not probe.get("ok"):
+                return (2, 0.0)
+            return (0, probe.get("ttft") or 0.0)
+        return sorted(model_ids, key=sort_key)
+
+    def probe_candidates(self, model_ids, max_age, limit):
+        # Models never probed or probed longer than max_age ago, oldest first,
+        # so a large list is covered over several launches
+        now = time.time()
+        def checked(model_id):
+            return self.probes.get(model_id, {}).get("checked", 0)
+        stale = [m for m in model_ids if now - checked(m) > max_age]
+        return sorted(stale, key=checked)[:limit]
+
+    # --- Network ---
+
+    async def refresh(self, client, api_key=None):
+        # Returns True when the model list changed
+        headers = {}
+        if api_key:
+            headers["Authorization"] = f"Bearer {api_key}"
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+
+        response = await client.get("/models", headers=headers)
+        self.fetched = time.time()
+        if response.status_code == 304:
+            await asyncio.to_thread(self.save)
+            return False
+        response.raise_for_status()
+
+        self.models = [
+            {"id": m["id"], "name": m.get("name") or m["id"],
+             "context_length": m.get("context_length"), "pricing": m.get("pricing") or {}}
+            for m in response.json().get("data", [])
+        ]
+        self.etag = response.headers.get("ETag")
+        self.last_modified = response.headers.get("Last-Modified")
+        await asyncio.to_thread(self.save)
+        return True
+
+    async def probe(self, client, api_key, model_ids, concurrency=4, timeout=20.0, rate_limiter=None):
+        # Probes count against the key's rate limit like any other request;
+        # a model with no request to spare is left for a later probe
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(model_id):
+            async with semaphore:
+                if rate_limiter is not None and rate_limiter.wait_time(api_key, model_id) > 0:
+                    return
+                self.probes[model_id] = await self._probe_one(client, api_key, model_id, timeout, rate_limiter)
+
+        await asyncio.gather(*(run(model_id) for model_id in model_ids))
+        await asyncio.to_thread(self.save)
+
+    async def _probe_one(self, client, api_key, model_id, timeout, rate_limiter=None):
+        result = {"ok": False, "ttft": None, "checked": time.time(), "error": None}
+        try:
+            result["ttft"] = await asyncio.wait_for(
+                self._first_event(client, api_key, model_id, rate_limiter), timeout)
+            result["ok"] = True
+        except asyncio.TimeoutError:
+            result["error"] = "timeout"
+        except Exception as e:
+            result["error"] = str(e) or type(e).__name__
+        return result
+
+    async def _first_event(self, client, api_key, model_id, rate_limiter=None):
+        # One-token streamed request; TTFT is the first chunk with output after
+        # sending (OpenRouter's empty opening chunk does not count)
+        headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+        data = {"model": model_id, "messages": PROBE_PROMPT, "stream": True, "max_tokens": 1}
+        if rate_limiter is not None:
+            await asyncio.sleep(rate_limiter.reserve(api_key, model_id))
+        start = time.perf_counter()
+        async with client.stream("POST", "/chat/completions", headers=headers, json=data) as response:
+            if rate_limiter is not None:
+                rate_limiter.update(api_key, model_id, response.status_code, response.headers)
+            if response.status_code != 200:
+                raise RuntimeError(f"HTTP {response.status_code}")
+            decoder = SSEDecoder()
+            async for chunk in response.aiter_bytes():
+                for delta in iter_deltas(decoder, chunk):
+                    if delta is None:
+                        raise RuntimeError("empty stream")
+                    if delta.content or delta.reasoning or delta.finish_reason or delta.usage:
+                        return round(time.perf_counter() - start, 3)
+        raise RuntimeError("empty stream")
@@ -0,0 +1,116 @@
+# Client-side rate limiting from OpenRouter's quota headers
+# One token bucket per API key and model. Buckets start from a configured
+# requests-per-minute rate and are corrected by every response:
+# X-RateLimit-Limit / -Remaining / -Reset and, on 429, Retry-After. The engine
+# asks how long a request would have to wait before sending it, so requests
+# that are certain to be rejected are delayed or sent to another model instead.
+
+import email.utils
+import hashlib
+import threading
+import time
+
+
+def parse_retry_after(value, now=None):
+    # Seconds to wait: Retry-After is either a number of seconds or an HTTP date
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when - (now or time.time()))
+
+
+def parse_reset(value, now=None):
+    # Seconds until X-RateLimit-Reset; OpenRouter sends epoch milliseconds
+    try:
+        reset = float(value)
+    except (TypeError, ValueError):
+        return None
+    now = now or time.time()
+    if reset > 1e12:
+        return max(0.0, reset / 1000 - now)
+    if reset > 1e9:
+        return max(0.0, reset - now)
+    return max(0.0, reset)
+
+
+class TokenBucket:
+    def __init__(self, capacity, per_second):
+        self.capacity = capacity
+        self.rate = per_second
+        self.tokens = float(capacity)   # below zero once requests are queued ahead
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0        # set by Retry-After or an exhausted quota
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now):
+        self._refill(now)
+        wait = max(0.0, self.blocked_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def take(self, now):
+        wait = self.wait_time(now)
+        self.tokens -= 1
+        return wait
+
+
+class RateLimiter:
+    def __init__(self, requests_per_minute):
+        self.requests_per_minute = requests_per_minute
+        self.buckets = {}  # (key hash, model) -> TokenBucket
+        self.lock = threading.Lock()
+
+    def _bucket(self, api_key, model):
+        key = (hashlib.sha256(api_key.encode()).hexdigest()[:16], model)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(self.requests_per_minute, self.requests_per_minute / 60)
+        return bucket
+
+    def wait_time(self, api_key, model):
+        with self.lock:
+            return self._bucket(api_key, model).wait_time(time.monotonic())
+
+    def reserve(self, api_key, model):
+        # Claims a request slot; returns the seconds to wait before sending
+        with self.lock:
+            return self._bucket(api_key, model).take(time.monotonic())
+
+    def update(self, api_key, model, status, headers):
+        limit = headers.get("X-RateLimit-Limit")
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset_in = parse_reset(headers.get("X-RateLimit-Reset"))
+        retry_after = parse_retry_after(headers.get("Retry-After")) if status == 429 else None
+        with self.lock:
+            bucket = self._bucket(api_key, model)
+            now = time.monotonic()
+            bucket._refill(now)
+            if limit is not None and limit.isdigit() and int(limit) > 0:
+                bucket.capacity = int(limit)
+            if remaining is not None and remaining.isdigit():
+                bucket.tokens = min(bucket.tokens, int(remaining))
+                if int(remaining) == 0 and reset_in is not None:
+                    bucket.blocked_until = max(bucket.blocked_until, now + reset_in)
+            if status == 429:
+                bucket.tokens = min(bucket.tokens, 0.0)
+                wait = retry_after if retry_after is not None else reset_in
+                if wait is not None:
+                    bucket.blocked_until = max(bucket.blocked_until, now + wait)
+
+    def quota(self, api_key, model):
+        # For the UI: requests available now, the bucket size and the wait for the next one
+        with self.lock:
+            bucket = self._bucket(api_key, model)
+            wait = bucket.wait_time(time.monotonic())
+            return (0 if wait else max(0, int(bucket.tokens))), bucket.capacity, wait
@@ -0,0 +1,85 @@
+# Content-addressed cache of complete chat responses
+# Entries are keyed by a hash of the model, the messages and the request
+# parameters, stored as one JSON file each. File modification times double as
+# the LRU order: a hit touches the file, eviction removes the oldest first.
+# The TTL counts from the write time kept in the entry, so hits do not
+# extend it.
+
+import hashlib
+import json
+import os
+import time
+
+
+def cache_key(model, messages, params):
+    canonical = json.dumps({"model": model, "messages": messages, "params": params},
+                           sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, directory, max_bytes, ttl_seconds):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl_seconds:
+                os.remove(path)
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            if time.time() - entry.get("stored", 0) > self.ttl_seconds:
+                os.remove(path)
+                return None
+            os.utime(path)
+            return entry
+        except (OSError, ValueError, AttributeError):
+            return None
+
+    def put(self, key, entry):
+        path = self._path(key)
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({**entry, "stored": time.time()}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+        self.evict()
+
+    def evict(self):
+        # Drops expired entries, then the least recently used until under max_bytes.
+        # An entry last used more than ttl_seconds ago was also stored before
+        # then; expired entries that are still being hit are dropped by get.
+        now = time.time()
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for item in it:
+                if not item.name.endswith(".json"):
+                    continue
+                stat = item.stat()
+                if now - stat.st_mtime > self.ttl_seconds:
+                    self._remove(item.path)
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, item.path))
+                total += stat.st_size
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,123 @@
+# Lexical retrieval over the conversation history
+# Messages are split into chunks of a few paragraphs and indexed for BM25 as
+# they are appended, so a long-running chat can bring back earlier material
+# that no longer fits in the request. A query only touches the posting lists
+# of its own terms, which keeps lookups in the low milliseconds even for
+# histories of many thousands of chunks.
+
+import heapq
+import math
+import re
+
+from context import estimate_tokens
+
+CHUNK_WORDS = 120   # target chunk size; long pastes become several chunks
+K1 = 1.2
+B = 0.75
+MAX_QUERY_TERMS = 32
+
+WORD_RE = re.compile(r"\w+")
+STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from has have how i if in is it its
+me my no not of on or so that the their them then there these this to was we
+were what when where which who why will with you your
+""".split())
+
+
+def tokenize(text):
+    return [word for word in WORD_RE.findall(text.lower()) if word not in STOPWORDS]
+
+
+def chunk_text(text, max_words=CHUNK_WORDS):
+    # Paragraphs are packed together up to max_words; longer ones are split
+    chunks = []
+    current = []
+    words = 0
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph_words = paragraph.split()
+        if not paragraph_words:
+            continue
+        if words and words + len(paragraph_words) > max_words:
+            chunks.append("\n\n".join(current))
+            current, words = [], 0
+        if len(paragraph_words) > max_words:
+            while len(paragraph_words) > max_words:
+                chunks.append(" ".join(paragraph_words[:max_words]))
+                paragraph_words = paragraph_words[max_words:]
+            paragraph = " ".join(paragraph_words)
+        current.append(paragraph.strip())
+        words += len(paragraph_words)
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+class RetrievalIndex:
+    def __init__(self):
+        self.chunks = []     # chunk id -> (position, role, text, length in terms)
+        self.postings = {}   # term -> {chunk id: term frequency}
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def add(self, position, role, text):
+        # position orders messages; search only returns chunks before a position
+        for chunk in chunk_text(text):
+            terms = tokenize(chunk)
+            if not terms:
+                continue
+            chunk_id = len(self.chunks)
+            self.chunks.append((position, role, chunk, len(terms)))
+            self.total_length += len(terms)
+            counts = {}
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+            for term, count in counts.items():
+                self.postings.setdefault(term, {})[chunk_id] = count
+
+    def merge(self, other):
+        # Appends the chunks of another index, e.g. messages indexed while this
+        # one was being built in the background
+        offset = len(self.chunks)
+        self.chunks.extend(other.chunks)
+        self.total_length += other.total_length
+        for term, postings in other.postings.items():
+            merged = self.postings.setdefault(term, {})
+            for chunk_id, count in postings.items():
+                merged[chunk_id + offset] = count
+
+    def search(self, query, before, k):
+        # Returns up to k (score, chunk id) of chunks from messages before `before`
+        terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+        if not terms or not self.chunks:
+            return []
+        count = len(self.chunks)
+        average = self.total_length / count
+        scores = {}
+        for term in terms:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_id, frequency in postings.items():
+                position, _, _, length = self.chunks[chunk_id]
+                if position >= before:
+                    continue
+                norm = K1 * (1 - B + B * length / average)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * frequency * (K1 + 1) / (frequency + norm)
+        return heapq.nlargest(k, ((score, chunk_id) for chunk_id, score in scores.items()))
+
+    def recall(self, query, before, k, budget_tokens):
+        # The best chunks that fit in budget_tokens, formatted as one block in
+        # conversation order; "" if nothing relevant fits
+        picked = []
+        for _, chunk_id in self.search(query, before, k):
+            position, role, text, _ = self.chunks[chunk_id]
+            cost = estimate_tokens(text) + 4
+            if cost > budget_tokens:
+                continue
+            budget_tokens -= cost
+            picked.append((position, chunk_id, role, text))
+        picked.sort()
+        return "\n\n".join(f"{role.upper()}: {text}" for _, _, role, text in picked)
@@ -0,0 +1,155 @@
+# Incremental Server-Sent Events decoder for chat-completion streams
+# Works on raw byte chunks as they come off the socket, so it does not depend
+# on how the transport splits lines. Kept free of Qt and httpx so it can be
+# fed recorded streams directly.
+
+import json
+
+try:
+    import orjson
+    _loads = orjson.loads
+    JSON_BACKEND = "orjson"
+except ImportError:
+    _loads = json.loads
+    JSON_BACKEND = "json"
+
+DONE = b"[DONE]"
+
+
+class SSEError(ValueError):
+    pass
+
+
+class SSEEvent:
+    __slots__ = ("event", "data", "id", "retry")
+
+    def __init__(self, event, data, id=None, retry=None):
+        self.event = event
+        self.data = data
+        self.id = id
+        self.retry = retry
+
+    def __repr__(self):
+        return f"SSEEvent(event={self.event!r}, data={self.data!r}, id={self.id!r})"
+
+
+class SSEDecoder:
+    def __init__(self):
+        self._buffer = b""
+        self._data = []
+        self._event = None
+        self._retry = None
+        self.last_event_id = None
+        self.comments = 0          # keep-alives such as ": OPENROUTER PROCESSING"
+        self.last_comment = None
+
+    def feed(self, chunk):
+        # Returns the events completed by this chunk, in order
+        if b"\r" in chunk or self._buffer.endswith(b"\r"):
+            chunk = self._buffer + chunk
+            self._buffer = b""
+            # A trailing CR may be the first half of a CRLF split across chunks
+            if chunk.endswith(b"\r"):
+                self._buffer = b"\r"
+                chunk = chunk[:-1]
+            chunk = chunk.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+        elif self._buffer:
+            chunk = self._buffer + chunk
+            self._buffer = b""
+
+        lines = chunk.split(b"\n")
+        tail = lines.pop()
+        if tail:
+            self._buffer = tail + self._buffer
+
+        events = []
+        for line in lines:
+            if not line:
+                event = self._dispatch()
+                if event is not None:
+                    events.append(event)
+            elif line[0] == 0x3A:  # ":"
+                self.comments += 1
+                self.last_comment = line[1:].strip()
+            else:
+                self._field(line)
+        return events
+
+    def _field(self, line):
+        name, sep, value = line.partition(b":")
+        if sep and value[:1] == b" ":
+            value = value[1:]
+        if name == b"data":
+            self._data.append(value)
+        elif name == b"event":
+            self._event = value.decode("utf-8", "replace")
+        elif name == b"id":
+            if b"\0" not in value:
+                self.last_event_id = value.decode("utf-8", "replace")
+        elif name == b"retry":
+            if value.isdigit():
+                self._retry = int(value)
+        # Unknown fields are ignored, as the spec requires
+
+    def _dispatch(self):
+        data = self._data
+        event_type = self._event
+        retry = self._retry
+        self._data = []
+        self._event = None
+        self._retry = None
+        if not data:
+            return None
+        payload = data[0] if len(data) == 1 else b"\n".join(data)
+        return SSEEvent(event_type or "message", payload, self.last_event_id, retry)
+
+
+# --- Chat completion chunks ---
+
+class ChatDelta:
+    __slots__ = ("content", "reasoning", "tool_calls", "finish_reason", "usage", "model")
+
+    def __init__(self, content="", reasoning="", tool_calls=None, finish_reason=None, usage=None, model=None):
+        self.content = content
+        self.reasoning = reasoning
+        self.tool_calls = tool_calls    # list of partial tool calls, as sent
+        self.finish_reason = finish_reason
+        self.usage = usage
+        self.model = model
+
+
+def parse_chunk(data):
+    # Returns a ChatDelta, or None for the "[DONE]" sentinel.
+    # Raises SSEError for malformed payloads and for errors sent mid-stream.
+    if data == DONE:
+        return None
+    try:
+        obj = _loads(data)
+    except ValueError as e:
+        raise SSEError(f"Malformed stream chunk: {data[:200]!r}") from e
+    if not isinstance(obj, dict):
+        raise SSEError(f"Unexpected stream chunk: {data[:200]!r}")
+
+    error = obj.get("error")
+    if error:
+        message = error.get("message", error) if isinstance(error, dict) else error
+        raise SSEError(f"Stream Error: {message}")
+
+    delta = ChatDelta(usage=obj.get("usage"), model=obj.get("model"))
+    choices = obj.get("choices")
+    if choices:
+        choice = choices[0]
+        delta.finish_reason = choice.get("finish_reason")
+        fields = choice.get("delta")
+        if fields:
+            delta.content = fields.get("content") or ""
+            delta.reasoning = fields.get("reasoning") or ""
+            delta.tool_calls = fields.get("tool_calls") or None
+    return delta
+
+
+def iter_deltas(decoder, chunk):
+    # Decodes one byte chunk into ChatDeltas; "[DONE]" is yielded as None
+    for event in decoder.feed(chunk):
+        if event.event == "message":
+            yield parse_chunk(event.data)
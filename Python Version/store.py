@@ -0,0 +1,182 @@
+# SQLite conversation store
+# WAL mode lets the GUI thread read while a background writer thread appends;
+# writes are queued and committed in batches so they never block streaming.
+# Message text is indexed with FTS5 for full-text search across all chats.
+
+import queue
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+
+PAGE_SIZE = 50
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS conversations_updated ON conversations(updated);
+
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    conversation_id TEXT NOT NULL REFERENCES conversations(id),
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    model TEXT,
+    tokens INTEGER,
+    truncated INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_conversation ON messages(conversation_id, id);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    content, content='messages', content_rowid='id'
+);
+
+CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+    UPDATE conversations SET updated = new.created WHERE id = new.conversation_id;
+END;
+CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+END;
+"""
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def fts_query(text):
+    # Quote every term so user input is never parsed as FTS syntax; the last
+    # term is a prefix match so results show up while typing.
+    terms = [t.replace('"', '""') for t in text.split()]
+    if not terms:
+        return ""
+    quoted = [f'"{t}"' for t in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+class ConversationStore:
+    def __init__(self, path):
+        self.path = path
+        self._reader = _connect(path)
+        self._reader.executescript(SCHEMA)
+        self._migrate()
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="store-writer", daemon=True)
+        self._writer.start()
+
+    def _migrate(self):
+        # Columns added after the first release
+        columns = {row["name"] for row in self._reader.execute("PRAGMA table_info(messages)")}
+        if "truncated" not in columns:
+            with self._reader:
+                self._reader.execute("ALTER TABLE messages ADD COLUMN truncated INTEGER NOT NULL DEFAULT 0")
+
+    # --- Writes (queued) ---
+
+    def new_conversation(self, title):
+        conversation_id = uuid.uuid4().hex
+        now = time.time()
+        self._queue.put(("INSERT INTO conversations (id, title, created, updated) VALUES (?, ?, ?, ?)",
+                         (conversation_id, title, now, now)))
+        return conversation_id
+
+    def append_message(self, conversation_id, role, content, model=None, tokens=None, truncated=False):
+        self._queue.put(("INSERT INTO messages (conversation_id, role, content, model, tokens, truncated, created) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (conversation_id, role, content, model, tokens, int(truncated), time.time())))
+
+    def flush(self, timeout=5.0):
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self):
+        self._queue.put(None)
+        self._writer.join(5.0)
+        self._reader.close()
+
+    def _write_loop(self):
+        conn = _connect(self.path)
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            # Commit everything already queued in one transaction
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = False
+            try:
+                with conn:
+                    for item in batch:
+                        if item is None:
+                            stop = True
+                        elif not isinstance(item, threading.Event):
+                            conn.execute(*item)
+            except sqlite3.Error as e:
+                print(f"History store write failed: {e}", file=sys.stderr)
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+            if stop:
+                conn.close()
+                return
+
+    # --- Reads ---
+
+    def list_conversations(self, limit=100):
+        rows = self._reader.execute(
+            "SELECT id, title, updated FROM conversations ORDER BY updated DESC LIMIT ?", (limit,))
+        return [dict(row) for row in rows]
+
+    def count_messages(self, conversation_id):
+        row = self._reader.execute(
+            "SELECT COUNT(*) FROM messages WHERE conversation_id = ?", (conversation_id,)).fetchone()
+        return row[0]
+
+    def load_page(self, conversation_id, before_id=None, limit=PAGE_SIZE):
+        # Newest page first: returns (messages oldest to newest, has_more)
+        if before_id is None:
+            before_id = 2 ** 63 - 1
+        rows = self._reader.execute(
+            "SELECT id, role, content, model, tokens, truncated FROM messages "
+            "WHERE conversation_id = ? AND id < ? ORDER BY id DESC LIMIT ?",
+            (conversation_id, before_id, limit + 1)).fetchall()
+        has_more = len(rows) > limit
+        messages = [dict(row) for row in reversed(rows[:limit])]
+        return messages, has_more
+
+    def iter_messages(self, conversation_id, before_id):
+        # Oldest to newest, on a connection of its own so it can run off the UI thread
+        conn = _connect(self.path)
+        try:
+            yield from conn.execute(
+                "SELECT role, content FROM messages WHERE conversation_id = ? AND id < ? ORDER BY id",
+                (conversation_id, before_id))
+        finally:
+            conn.close()
+
+    def search(self, text, limit=50):
+        query = fts_query(text)
+        if not query:
+            return []
+        rows = self._reader.execute(
+            "SELECT m.id, m.conversation_id, m.role, c.title, "
+            "snippet(messages_fts, 0, '', '', '...', 12) AS snippet "
+            "FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid "
+            "JOIN conversations c ON c.id = m.conversation_id "
+            "WHERE messages_fts MATCH ? ORDER BY rank LIMIT ?", (query, limit))
+        return [dict(row) for row in rows]
@@ -0,0 +1,185 @@
+# Streaming performance telemetry
+# StreamEngine records one sample per finished stream: time to first byte,
+# time to first token, the gaps between tokens, throughput and the usage
+# block of the final chunk. Samples are folded into fixed-bucket histograms
+# per model, which stay small no matter how many requests are made, persist
+# across sessions and export to Prometheus text or JSONL.
+
+import json
+import os
+import threading
+import time
+
+LATENCY_BOUNDS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32)             # seconds
+GAP_BOUNDS = (0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2)        # seconds
+RATE_BOUNDS = (5, 10, 20, 40, 80, 160, 320)                        # tokens per second
+
+METRICS = {
+    # name: (bounds, description)
+    "ttfb_seconds": (LATENCY_BOUNDS, "Time from sending the request to the response headers"),
+    "ttft_seconds": (LATENCY_BOUNDS, "Time from sending the request to the first token"),
+    "inter_token_seconds": (GAP_BOUNDS, "Time between consecutive streamed tokens"),
+    "tokens_per_second": (RATE_BOUNDS, "Completion tokens per second after the first token"),
+}
+COUNTERS = ("requests", "errors", "cancelled", "prompt_tokens", "completion_tokens")
+
+
+class Histogram:
+    def __init__(self, bounds, counts=None, total=0.0):
+        self.bounds = bounds
+        self.counts = counts or [0] * (len(bounds) + 1)   # last bucket is +Inf
+        self.total = total
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def observe(self, value):
+        index = 0
+        while index < len(self.bounds) and value > self.bounds[index]:
+            index += 1
+        self.counts[index] += 1
+        self.total += value
+
+    def quantile(self, q):
+        # Linear interpolation inside the bucket holding the q-th observation
+        count = self.count
+        if not count:
+            return None
+        rank = q * count
+        seen = 0
+        for index, bucket in enumerate(self.counts):
+            if bucket and seen + bucket >= rank:
+                lower = self.bounds[index - 1] if index else 0.0
+                if index == len(self.bounds):
+                    return lower
+                return lower + (self.bounds[index] - lower) * (rank - seen) / bucket
+            seen += bucket
+        return self.bounds[-1]
+
+    def mean(self):
+        count = self.count
+        return self.total / count if count else None
+
+
+class ModelStats:
+    def __init__(self, data=None):
+        data = data or {}
+        self.counters = {name: data.get(name, 0) for name in COUNTERS}
+        self.histograms = {}
+        for name, (bounds, _) in METRICS.items():
+            saved = data.get(name) or {}
+            counts = saved.get("counts")
+            if counts is not None and len(counts) != len(bounds) + 1:
+                counts = None  # bucket layout changed; start over
+            self.histograms[name] = Histogram(bounds, counts, saved.get("sum", 0.0) if counts else 0.0)
+
+    def to_dict(self):
+        data = dict(self.counters)
+        for name, histogram in self.histograms.items():
+            data[name] = {"counts": histogram.counts, "sum": histogram.total}
+        return data
+
+
+class Telemetry:
+    def __init__(self, path):
+        self.path = path
+        self.models = {}  # model id -> ModelStats
+        self.lock = threading.Lock()
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.models = {model: ModelStats(stats) for model, stats in data.get("models", {}).items()}
+
+    def save(self):
+        with self.lock:
+            data = {"models": {model: stats.to_dict() for model, stats in self.models.items()}}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def reset(self):
+        with self.lock:
+            self.models = {}
+
+    def record(self, model, ttfb=None, ttft=None, gaps=(), duration=None, tokens=0,
+               usage=None, error=False, cancelled=False):
+        # Called from the engine thread when a stream ends
+        with self.lock:
+            stats = self.models.get(model)
+            if stats is None:
+                stats = self.models[model] = ModelStats()
+            counters, histograms = stats.counters, stats.histograms
+            counters["requests"] += 1
+            if error:
+                counters["errors"] += 1
+            if cancelled:
+                counters["cancelled"] += 1
+            if ttfb is not None:
+                histograms["ttfb_seconds"].observe(ttfb)
+            if ttft is not None:
+                histograms["ttft_seconds"].observe(ttft)
+            for gap in gaps:
+                histograms["inter_token_seconds"].observe(gap)
+            if usage:
+                counters["prompt_tokens"] += usage.get("prompt_tokens") or 0
+                counters["completion_tokens"] += usage.get("completion_tokens") or 0
+                tokens = usage.get("completion_tokens") or tokens
+            if duration and tokens > 1:
+                histograms["tokens_per_second"].observe(tokens / duration)
+
+    # --- Reporting ---
+
+    def summary(self):
+        # One row per model for the stats panel and the JSONL export
+        rows = []
+        with self.lock:
+            for model, stats in sorted(self.models.items()):
+                row = {"model": model, **stats.counters}
+                for name, histogram in stats.histograms.items():
+                    row[name] = {"p50": histogram.quantile(0.5), "p95": histogram.quantile(0.95),
+                                 "mean": histogram.mean(), "count": histogram.count}
+                rows.append(row)
+        return rows
+
+    def export_jsonl(self, path):
+        timestamp = time.time()
+        with open(path, "a", encoding="utf-8") as f:
+            for row in self.summary():
+                f.write(json.dumps({"timestamp": timestamp, **row}) + "\n")
+
+    def export_prometheus(self, path):
+        lines = []
+        with self.lock:
+            models = sorted(self.models.items())
+            for counter in COUNTERS:
+                metric = f"aichat_{counter}_total"
+                lines.append(f"# TYPE {metric} counter")
+                for model, stats in models:
+                    lines.append(f'{metric}{{model="{_label(model)}"}} {stats.counters[counter]}')
+            for name, (bounds, description) in METRICS.items():
+                metric = f"aichat_{name}"
+                lines.append(f"# HELP {metric} {description}")
+                lines.append(f"# TYPE {metric} histogram")
+                for model, stats in models:
+                    histogram = stats.histograms[name]
+                    label = _label(model)
+                    cumulative = 0
+                    for bound, bucket in zip((*bounds, "+Inf"), histogram.counts):
+                        cumulative += bucket
+                        lines.append(f'{metric}_bucket{{model="{label}",le="{bound}"}} {cumulative}')
+                    lines.append(f'{metric}_sum{{model="{label}"}} {histogram.total}')
+                    lines.append(f'{metric}_count{{model="{label}"}} {cumulative}')
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+
+
+def _label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,72 @@
+# Tests for context packing and recall from the retrieval index
+# Run from "Python Version": python -m unittest discover tests (or python -m pytest)
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from context import ContextPacker, estimate_tokens  # noqa: E402
+from retrieval import RetrievalIndex  # noqa: E402
+
+
+def conversation(turns, relevant=()):
+    # Turns of about 100 tokens each; the relevant ones mention zebras, and
+    # so does the final question
+    messages = []
+    for i in range(turns):
+        words = " ".join(f"t{i}w{j}" for j in range(60))
+        extra = " zebra stripes" if i in relevant else ""
+        messages.append({"role": "user" if i % 2 == 0 else "assistant", "content": f"turn{i} {words}{extra}"})
+    messages.append({"role": "user", "content": "zebra stripes?"})
+    return messages
+
+
+def packer(budget, messages=None):
+    result = ContextPacker({"m": budget}, budget, 0)
+    if messages is not None:
+        result.retrieval = RetrievalIndex()
+        for position, message in enumerate(messages):
+            result.retrieval.add(position, message["role"], message["content"])
+    return result
+
+
+class PackTest(unittest.TestCase):
+    def test_newest_turns_that_fit(self):
+        messages = conversation(10)
+        payload, first_kept = packer(350).pack(messages, "m")
+        self.assertEqual(first_kept, 7)
+        self.assertEqual([m["content"] for m in payload], [m["content"] for m in messages[7:]])
+
+    def test_latest_message_is_always_sent(self):
+        messages = conversation(3)
+        payload, first_kept = packer(1).pack(messages, "m")
+        self.assertEqual((first_kept, len(payload)), (3, 1))
+
+    def test_everything_fits(self):
+        messages = conversation(3, relevant=(0,))
+        payload, first_kept = packer(10000, messages).pack(messages, "m")
+        self.assertEqual(first_kept, 0)
+        self.assertTrue(all(m["role"] != "system" for m in payload))
+
+    def test_recalls_dropped_turns(self):
+        messages = conversation(10, relevant=(0,))
+        payload, first_kept = packer(600, messages).pack(messages, "m")
+        self.assertEqual(payload[0]["role"], "system")
+        self.assertIn("turn0 ", payload[0]["content"])
+        self.assertNotIn("turn0 ", " ".join(m["content"] for m in payload[1:]))
+
+    def test_turns_displaced_by_recall_can_be_recalled(self):
+        # Making room for turn0 pushes turn7 out of the kept turns; it must
+        # then be a recall candidate rather than disappear
+        messages = conversation(10, relevant=(0, 7))
+        payload, first_kept = packer(300, messages).pack(messages, "m")
+        self.assertGreater(first_kept, 7)
+        self.assertIn("turn7 ", payload[0]["content"])
+        self.assertIn("turn0 ", payload[0]["content"])
+        self.assertLessEqual(sum(estimate_tokens(m["content"]) + 4 for m in payload), 300)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+# Tests for the engine's retries, failover, hedging and stall timeout
+# Each test runs the engine against MockServer on the engine's own loop.
+# Run from "Python Version": python -m unittest discover tests (or python -m pytest)
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import StreamEngine, create_client  # noqa: E402
+from mock_openrouter import MockConfig, MockServer  # noqa: E402
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+TIMEOUT = 10.0
+
+
+class RecordingEngine(StreamEngine):
+    # Remembers the models of attempts that were cancelled
+    def __init__(self, client):
+        super().__init__(client)
+        self.cancelled_models = []
+
+    async def _pump(self, api_key, attempt, delay, params):
+        try:
+            await super()._pump(api_key, attempt, delay, params)
+        except asyncio.CancelledError:
+            self.cancelled_models.append(attempt.model)
+            raise
+
+
+class Listener:
+    def __init__(self):
+        self.tokens = []
+        self.errors = []
+        self.done = threading.Event()
+
+    def on_token(self, handle, token):
+        self.tokens.append(token)
+
+    def on_error(self, handle, message):
+        self.errors.append(message)
+
+    def on_finished(self, handle):
+        self.done.set()
+
+
+class EngineTest(unittest.TestCase):
+    def setUp(self):
+        self.mock = MockServer(MockConfig(tokens=5, rate=0), model_configs={
+            "down": MockConfig(errors={503: 1.0}),
+            "unauthorized": MockConfig(errors={401: 1.0}),
+            "slow": MockConfig(tokens=5, rate=0, first_token_delay=2.0),
+            "stalled": MockConfig(stall_rate=1.0),
+        })
+        self.engine = None
+
+    def start_engine(self, **settings):
+        # The mock binds its port on the engine's loop, so the client comes after
+        self.engine = RecordingEngine(None)
+        self.engine.start()
+        self.engine.submit(self.mock.start()).result(TIMEOUT)
+        self.engine.client = create_client(self.mock.base_url)
+        self.engine.backoff_base = 0.01
+        for name, value in settings.items():
+            setattr(self.engine, name, value)
+        return self.engine
+
+    def tearDown(self):
+        if self.engine is not None:
+            self.engine.submit(self.mock.close()).result(TIMEOUT)
+            self.engine.close()
+
+    def cancelled_models(self):
+        # Cancellation reaches the attempt's task on the loop's next pass,
+        # which may be after on_finished
+        return self.engine.submit(asyncio.sleep(0.05, self.engine.cancelled_models)).result(TIMEOUT)
+
+    def stream(self, model, *fallbacks):
+        listener = Listener()
+        handle = self.engine.stream_chat("key", model, MESSAGES, listener,
+                                         fallbacks=[(fallback, MESSAGES) for fallback in fallbacks])
+        self.assertTrue(listener.done.wait(TIMEOUT))
+        return handle, listener
+
+    def test_plain_stream(self):
+        self.start_engine()
+        handle, listener = self.stream("ok")
+        self.assertTrue(handle.succeeded)
+        self.assertEqual((handle.model, handle.attempts, handle.finish_reason), ("ok", 1, "stop"))
+        self.assertEqual(len("".join(listener.tokens)), 20)
+
+    def test_retry_then_failover_on_503(self):
+        self.start_engine(max_retries=1)
+        handle, listener = self.stream("down", "ok")
+        self.assertTrue(handle.succeeded)
+        self.assertEqual((handle.model, handle.attempts), ("ok", 3))
+        self.assertEqual(self.mock.chat_requests, {"down": 2, "ok": 1})
+        self.assertEqual(listener.errors, [])
+
+    def test_503_without_fallback_reports_the_error(self):
+        self.start_engine(max_retries=2)
+        handle, listener = self.stream("down")
+        self.assertFalse(handle.succeeded)
+        self.assertEqual(self.mock.chat_requests, {"down": 3})
+        self.assertEqual(len(listener.errors), 1)
+        self.assertIn("503", listener.errors[0])
+
+    def test_401_stops_immediately(self):
+        self.start_engine(max_retries=2)
+        handle, listener = self.stream("unauthorized", "ok")
+        self.assertFalse(handle.succeeded)
+        self.assertEqual(self.mock.chat_requests, {"unauthorized": 1})
+        self.assertEqual(len(listener.errors), 1)
+        self.assertIn("401", listener.errors[0])
+
+    def test_hedge_starts_fallback_and_cancels_loser(self):
+        self.start_engine(hedge_after=0.2)
+        start = time.perf_counter()
+        handle, listener = self.stream("slow", "ok")
+        self.assertLess(time.perf_counter() - start, 1.5)
+        self.assertTrue(handle.succeeded)
+        self.assertEqual((handle.model, handle.attempts), ("ok", 2))
+        self.assertEqual(self.cancelled_models(), ["slow"])
+
+    def test_no_hedge_when_first_model_answers_in_time(self):
+        self.start_engine(hedge_after=1.0)
+        handle, _ = self.stream("ok", "slow")
+        self.assertEqual((handle.model, handle.attempts), ("ok", 1))
+        self.assertEqual(self.mock.chat_requests, {"ok": 1})
+
+    def test_stall_after_opening_chunk_fails_over(self):
+        # The mock sends headers and an empty assistant chunk, then nothing:
+        # that is not an answer, so the stall timeout still applies
+        self.start_engine(stall_timeout=0.3)
+        start = time.perf_counter()
+        handle, listener = self.stream("stalled", "ok")
+        self.assertLess(time.perf_counter() - start, 2.0)
+        self.assertTrue(handle.succeeded)
+        self.assertEqual(handle.model, "ok")
+        self.assertEqual(self.cancelled_models(), ["stalled"])
+
+    def test_stall_without_fallback_reports_the_error(self):
+        self.start_engine(stall_timeout=0.3)
+        handle, listener = self.stream("stalled")
+        self.assertFalse(handle.succeeded)
+        self.assertEqual(len(listener.errors), 1)
+        self.assertIn("sent nothing", listener.errors[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+# Tests for the on-disk response cache
+# Run from "Python Version": python -m unittest discover tests (or python -m pytest)
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from response_cache import ResponseCache, cache_key  # noqa: E402
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.cache = ResponseCache(self.tmp.name, 10 ** 6, ttl_seconds=60)
+        self.now = 1_000_000.0
+        patcher = mock.patch("response_cache.time.time", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_hit(self):
+        self.cache.put("k", {"content": "answer"})
+        self.assertEqual(self.cache.get("k")["content"], "answer")
+        self.assertIsNone(self.cache.get("other"))
+
+    def test_hits_do_not_extend_ttl(self):
+        self.cache.put("k", {"content": "answer"})
+        for _ in range(4):
+            self.now += 20
+            entry = self.cache.get("k")
+        self.assertIsNone(entry)
+        self.assertFalse(os.listdir(self.tmp.name))
+
+    def test_key_depends_on_params(self):
+        messages = [{"role": "user", "content": "hi"}]
+        self.assertNotEqual(cache_key("m", messages, {"temperature": 0}),
+                            cache_key("m", messages, {"temperature": 1}))
+
+
+if __name__ == "__main__":
+    unittest.main()
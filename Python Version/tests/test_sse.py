@@ -0,0 +1,182 @@
+# Tests for the SSE decoder against recorded OpenRouter streams
+# Run from "Python Version": python -m unittest discover tests (or python -m pytest)
+
+import json
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sse import SSEDecoder, SSEError, iter_deltas, parse_chunk  # noqa: E402
+
+RECORDINGS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recordings")
+EXPECTED_TEXT = 'Hello! Here is some code:\n\n```python\nprint("héllo")\n``` 🎉'
+
+
+def recording(name):
+    with open(os.path.join(RECORDINGS, name), "rb") as f:
+        return f.read()
+
+
+def decode(chunks):
+    decoder = SSEDecoder()
+    events = []
+    for chunk in chunks:
+        events.extend(decoder.feed(chunk))
+    return decoder, events
+
+
+def collect(chunks):
+    # (text, finish_reason, usage, saw [DONE]) of a chat-completion stream
+    decoder = SSEDecoder()
+    text, finish_reason, usage = [], None, None
+    for chunk in chunks:
+        for delta in iter_deltas(decoder, chunk):
+            if delta is None:
+                return "".join(text), finish_reason, usage, True
+            text.append(delta.content)
+            finish_reason = delta.finish_reason or finish_reason
+            usage = delta.usage or usage
+    return "".join(text), finish_reason, usage, False
+
+
+def split_at(body, points):
+    bounds = [0, *sorted(points), len(body)]
+    return [body[a:b] for a, b in zip(bounds, bounds[1:])]
+
+
+class RecordedStreamTest(unittest.TestCase):
+    def check_stream(self, body):
+        text, finish_reason, usage, done = collect([body])
+        self.assertEqual(text, EXPECTED_TEXT)
+        self.assertEqual(finish_reason, "stop")
+        self.assertEqual(usage["completion_tokens"], 21)
+        self.assertTrue(done)
+
+    def test_whole_body(self):
+        self.check_stream(recording("openrouter_stream.sse"))
+
+    def test_crlf_body(self):
+        self.check_stream(recording("openrouter_stream_crlf.sse"))
+
+    def test_every_two_way_split(self):
+        for name in ("openrouter_stream.sse", "openrouter_stream_crlf.sse"):
+            body = recording(name)
+            expected = collect([body])
+            for point in range(1, len(body)):
+                self.assertEqual(collect(split_at(body, [point])), expected, (name, point))
+
+    def test_byte_at_a_time(self):
+        body = recording("openrouter_stream_crlf.sse")
+        self.assertEqual(collect([body[i:i + 1] for i in range(len(body))]), collect([body]))
+
+    def test_random_splits(self):
+        rng = random.Random(1234)
+        body = recording("openrouter_stream_crlf.sse")
+        expected = collect([body])
+        for _ in range(200):
+            points = rng.sample(range(1, len(body)), rng.randint(1, 40))
+            self.assertEqual(collect(split_at(body, points)), expected)
+
+    def test_keepalive_comments(self):
+        decoder, events = decode([recording("openrouter_stream.sse")])
+        self.assertEqual(decoder.comments, 2)
+        self.assertEqual(decoder.last_comment, b"OPENROUTER PROCESSING")
+        self.assertTrue(all(event.event == "message" for event in events))
+
+    def test_error_mid_stream(self):
+        decoder = SSEDecoder()
+        text = []
+        with self.assertRaisesRegex(SSEError, "Provider returned error"):
+            for delta in iter_deltas(decoder, recording("openrouter_error.sse")):
+                text.append(delta.content)
+        self.assertEqual(text, ["Partial"])
+
+
+class DecoderTest(unittest.TestCase):
+    def test_crlf_split_across_chunks(self):
+        _, events = decode([b"data: one\r", b"\ndata: two\r", b"\n\r", b"\n"])
+        self.assertEqual([event.data for event in events], [b"one\ntwo"])
+
+    def test_lone_cr_line_endings(self):
+        # A trailing CR may still turn into CRLF, so it only ends a line once more arrives
+        decoder, events = decode([b"data: a\r\rdata: b\r", b"\r"])
+        self.assertEqual([event.data for event in events], [b"a"])
+        self.assertEqual([event.data for event in decoder.feed(b"data: c\n")], [b"b"])
+
+    def test_multiline_data(self):
+        _, events = decode([b"data: {\"a\":\ndata: 1}\n\n"])
+        self.assertEqual(events[0].data, b'{"a":\n1}')
+
+    def test_space_after_colon_is_optional(self):
+        _, events = decode([b"data:x\ndata:  y\n\n"])
+        self.assertEqual(events[0].data, b"x\n y")
+
+    def test_event_id_and_retry(self):
+        decoder, events = decode([b"event: ping\nid: 7\nretry: 1500\ndata: x\n\n", b"data: y\n\n"])
+        self.assertEqual((events[0].event, events[0].id, events[0].retry), ("ping", "7", 1500))
+        # The last event id carries over; event type and retry do not
+        self.assertEqual((events[1].event, events[1].id, events[1].retry), ("message", "7", None))
+        self.assertEqual(decoder.last_event_id, "7")
+
+    def test_invalid_id_and_retry_are_ignored(self):
+        decoder, events = decode([b"id: 1\n\n", b"id: a\0b\nretry: soon\ndata: x\n\n"])
+        self.assertEqual((events[0].id, events[0].retry), ("1", None))
+        self.assertEqual(decoder.last_event_id, "1")
+
+    def test_unknown_fields_and_empty_events(self):
+        _, events = decode([b"foo: bar\n\nevent: x\n\ndata: y\n\n"])
+        self.assertEqual([(event.event, event.data) for event in events], [("message", b"y")])
+
+    def test_incomplete_event_is_held_back(self):
+        decoder = SSEDecoder()
+        self.assertEqual(decoder.feed(b"data: x\n"), [])
+        self.assertEqual(decoder.feed(b"data: y"), [])
+        self.assertEqual([event.data for event in decoder.feed(b"\n\n")], [b"x\ny"])
+
+    def test_non_message_events_are_not_deltas(self):
+        self.assertEqual(list(iter_deltas(SSEDecoder(), b"event: ping\ndata: {}\n\n")), [])
+
+
+class ParseChunkTest(unittest.TestCase):
+    def test_done(self):
+        self.assertIsNone(parse_chunk(b"[DONE]"))
+
+    def test_content_and_reasoning(self):
+        delta = parse_chunk(b'{"model": "m", "choices": [{"delta": {"content": "hi", "reasoning": "hmm"}}]}')
+        self.assertEqual((delta.content, delta.reasoning, delta.model), ("hi", "hmm", "m"))
+
+    def test_tool_calls(self):
+        call = {"index": 0, "id": "call_1", "function": {"name": "f", "arguments": "{"}}
+        delta = parse_chunk(('{"choices": [{"delta": {"tool_calls": [%s]}}]}' % json.dumps(call)).encode())
+        self.assertEqual((delta.content, delta.tool_calls), ("", [call]))
+
+    def test_null_content(self):
+        delta = parse_chunk(b'{"choices": [{"delta": {"content": null}, "finish_reason": "length"}]}')
+        self.assertEqual((delta.content, delta.finish_reason), ("", "length"))
+
+    def test_usage_only_chunk(self):
+        delta = parse_chunk(b'{"choices": [], "usage": {"prompt_tokens": 3}}')
+        self.assertEqual((delta.content, delta.usage), ("", {"prompt_tokens": 3}))
+
+    def test_error_object(self):
+        with self.assertRaisesRegex(SSEError, "Rate limit exceeded"):
+            parse_chunk(b'{"error": {"code": 429, "message": "Rate limit exceeded"}}')
+
+    def test_error_string(self):
+        with self.assertRaisesRegex(SSEError, "overloaded"):
+            parse_chunk(b'{"error": "overloaded"}')
+
+    def test_malformed_json(self):
+        with self.assertRaisesRegex(SSEError, "Malformed"):
+            parse_chunk(b'{"choices": [')
+
+    def test_not_an_object(self):
+        with self.assertRaisesRegex(SSEError, "Unexpected"):
+            parse_chunk(b"[1, 2]")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+# Python-side model of the chat transcript
+# The page only keeps the items around its viewport in the DOM and asks for
+# the others by index range, so the full list of messages lives here. Items of
+# a reopened conversation are fetched from the store on first access.
+#
+# Items are plain dicts sent to the page as-is:
+#   {"role": "user", "content": ...}
+#   {"role": "ai", "content": ..., "label": ..., "note": ..., "streamId": ...}
+#   {"role": "compare", "columns": [<ai item without role>, ...]}
+# "streamId" is only present while the reply is still streaming.
+
+
+class TranscriptModel:
+    def __init__(self):
+        self.items = []
+        self.unloaded = 0    # items[:unloaded] have not been fetched yet
+        self.loader = None   # loader(count) -> up to `count` items preceding the loaded ones
+
+    def __len__(self):
+        return len(self.items)
+
+    def reset(self, items=(), unloaded=0, loader=None):
+        self.items = [None] * unloaded + list(items)
+        self.unloaded = unloaded
+        self.loader = loader
+
+    def append(self, item):
+        self.items.append(item)
+        return len(self.items) - 1
+
+    def get_range(self, start, end):
+        start = max(0, start)
+        end = min(end, len(self.items))
+        if start < self.unloaded and self.loader is not None:
+            older = self.loader(self.unloaded - start)[-self.unloaded:]
+            self.items[self.unloaded - len(older):self.unloaded] = older
+            self.unloaded -= len(older)
+        return self.items[start:end]